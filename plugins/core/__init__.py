@@ -1,13 +1,50 @@
 # -*- coding: utf-8 -*-
+import logging
 import os
 import os.path
 
-from logging.config import fileConfig
-
 ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+LOGS_DIR = os.environ.get('uanpps_logs_dir', os.path.join(ROOT_PATH, 'logs'))
+
+_logging_configured = False
+_numpy = None
+
+
+def ensure_dir(path):
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+def setup_logging():
+    # called on the fetch path only; `config` and `autoconf` runs never
+    # import logging.config or touch the logs directory
+    global _logging_configured
+    if _logging_configured:
+        return
+    from logging.config import fileConfig
+
+    ensure_dir(LOGS_DIR)
+    fileConfig(os.path.join(ROOT_PATH, 'logging_config.ini'),
+               defaults={'logs_dir': repr(LOGS_DIR)},
+               disable_existing_loggers=False)
+    _logging_configured = True
+
+
+def get_numpy():
+    # numpy, or None when it is not installed; imported on first use only,
+    # `config`, `autoconf` and result-print runs never need it
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
 
-logs_dir = os.path.join(ROOT_PATH, 'logs/')
-if not os.path.exists(logs_dir):
-    os.makedirs(logs_dir)
 
-fileConfig(os.path.join(ROOT_PATH, 'logging_config.ini'))
+# records logged before setup_logging() are dropped silently
+logging.getLogger().addHandler(logging.NullHandler())
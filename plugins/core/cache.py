@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+
+from core import ROOT_PATH
+from core import ensure_dir
+
+logger = logging.getLogger('uanpps-cache')
+
+CACHE_DIR = os.environ.get('uanpps_cache_dir',
+                           os.path.join(ROOT_PATH, 'cache', 'responses'))
+CACHE_TTL = int(os.environ.get('uanpps_cache_ttl', 60))
+CACHE_MAX_SIZE = int(os.environ.get('uanpps_cache_max_size', 16 * 1024 * 1024))
+
+
+class ResponseCache(object):
+    # Every entry is a single file: a JSON header line followed by the body,
+    # so an entry is always replaced atomically.
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL,
+                 max_size=CACHE_MAX_SIZE):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+
+    @staticmethod
+    def get_key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def get_path(self, url):
+        return os.path.join(self.directory, self.get_key(url))
+
+    def load(self, url):
+        try:
+            with io.open(self.get_path(url), 'rb') as entry_file:
+                meta = json.loads(entry_file.readline().decode('utf-8'))
+                body = entry_file.read()
+        except (IOError, OSError, ValueError):
+            return None
+        if meta.get('url') != url:
+            return None
+        meta['body'] = body
+        return meta
+
+    def is_fresh(self, entry):
+        return time.time() - entry['stored'] < self.ttl
+
+    def get_validators(self, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, body, etag=None, last_modified=None):
+        ensure_dir(self.directory)
+        meta = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored': time.time()
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as entry_file:
+            entry_file.write(json.dumps(meta).encode('utf-8') + b'\n')
+            entry_file.write(body)
+        os.rename(tmp_path, self.get_path(url))
+        self.evict()
+
+    def refresh(self, entry):
+        # the server confirmed that the body is still valid (304)
+        self.store(entry['url'], entry['body'], entry.get('etag'),
+                   entry.get('last_modified'))
+
+    def evict(self):
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+        # drop the least recently stored entries first
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            logger.debug('Evicted cache entry %s', path)
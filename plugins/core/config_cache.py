@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import glob
+import hashlib
+import io
+import logging
+import os
+import sys
+import tempfile
+
+from core import ROOT_PATH
+from core import ensure_dir
+from core import setup_logging
+from core.munin import MuninWriter
+
+logger = logging.getLogger('uanpps-config')
+
+CONFIG_CACHE_DIR = os.environ.get('uanpps_config_cache_dir',
+                                  os.path.join(ROOT_PATH, 'cache', 'config'))
+# the code rendering the config of every plugin
+RENDER_FILES = [os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             name)
+                for name in ('config_cache.py', 'munin.py', 'utils.py')]
+
+
+def get_source_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.json'))))
+        else:
+            files.append(path)
+    return files
+
+
+def get_stat_key(files, encoding):
+    stat_key = hashlib.sha1(encoding.encode('utf-8'))
+    for path in files:
+        stat = os.stat(path)
+        stat_key.update('{}:{}:{}\n'.format(
+            path, stat.st_mtime, stat.st_size).encode('utf-8'))
+    return stat_key.hexdigest()
+
+
+def get_content_hash(files, encoding):
+    content_hash = hashlib.sha1(encoding.encode('utf-8'))
+    for path in files:
+        with io.open(path, 'rb') as source_file:
+            content_hash.update(source_file.read())
+    return content_hash.hexdigest()
+
+
+def load_cached_config(path):
+    try:
+        with io.open(path, 'rb') as cache_file:
+            stat_key, content_hash = cache_file.readline().split()
+            return stat_key, content_hash, cache_file.read()
+    except (IOError, OSError, ValueError):
+        return None, None, None
+
+
+def store_cached_config(path, stat_key, content_hash, text):
+    ensure_dir(CONFIG_CACHE_DIR)
+    fd, tmp_path = tempfile.mkstemp(dir=CONFIG_CACHE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as cache_file:
+        cache_file.write('{} {}\n'.format(stat_key, content_hash)
+                         .encode('utf-8'))
+        cache_file.write(text)
+    os.rename(tmp_path, path)
+
+
+def get_output_encoding():
+    return getattr(sys.stdout, 'encoding', None) or sys.getdefaultencoding()
+
+
+def render_config(render, encoding):
+    writer = MuninWriter(encoding)
+    render(writer)
+    return writer.getvalue().encode(encoding)
+
+
+def print_config(name, paths, render):
+    # The rendered config only depends on the JSON files, the plugin itself
+    # and the rendering code of core: unchanged mtimes mean a plain file
+    # read, changed mtimes with unchanged contents only refresh the key.
+    path = os.path.join(CONFIG_CACHE_DIR, '{}.txt'.format(name))
+    files = get_source_files(paths) + RENDER_FILES
+    encoding = get_output_encoding()
+    stat_key = get_stat_key(files, encoding)
+    cached_stat_key, cached_hash, text = load_cached_config(path)
+
+    if cached_stat_key != stat_key.encode('utf-8'):
+        content_hash = get_content_hash(files, encoding)
+        if cached_hash != content_hash.encode('utf-8'):
+            setup_logging()
+            logger.info('Render config for %s', name)
+            text = render_config(render, encoding)
+        try:
+            store_cached_config(path, stat_key, content_hash, text)
+        except (IOError, OSError):
+            # rendered on every run, e.g. for a user without write access
+            setup_logging()
+            logger.exception('Failed to cache the config of %s', name)
+
+    sys.stdout.write(text)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import math
+
+logger = logging.getLogger('uanpps-convert')
+
+INF = float('inf')
+NAN = float('nan')
+
+
+def format_value(value):
+    return 'U' if math.isnan(value) else '{:.2f}'.format(value)
+
+
+class Conversion(object):
+    # The scaling of a field and the physical bounds of the scaled value;
+    # a value out of the bounds is clamped to them or rejected (NaN)
+    __slots__ = ('ratio', 'lower', 'upper', 'clamp')
+
+    def __init__(self, ratio=None, lower=None, upper=None, clamp=False):
+        self.ratio = ratio or 1.0
+        self.lower = -INF if lower is None else float(lower)
+        self.upper = INF if upper is None else float(upper)
+        self.clamp = bool(clamp)
+
+
+def get_conversion(config, ratio=None):
+    # "bounds": [lower, upper] (either may be null) and "clamp" of a graph
+    lower, upper = config.get('bounds') or (None, None)
+    return Conversion(ratio, lower, upper, config.get('clamp', False))
+
+
+class ConversionBatch(object):
+    # Raw values of the graphs of a run, kept in one column with the
+    # conversion of every run of values, and converted at once. convert()
+    # returns the values; NaN marks an unknown (munin `U`) value.
+
+    def __init__(self):
+        self.values = []
+        self.conversions = []
+        self.counts = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def extend(self, values, conversion):
+        if values:
+            self.values.extend(values)
+            self.conversions.append(conversion)
+            self.counts.append(len(values))
+
+    def convert(self):
+        values = []
+        start = 0
+        for conversion, count in zip(self.conversions, self.counts):
+            ratio = conversion.ratio
+            lower = conversion.lower
+            upper = conversion.upper
+            clamp = conversion.clamp
+            for value in self.values[start:start + count]:
+                value *= ratio
+                if value < lower:
+                    value = lower if clamp else NAN
+                elif value > upper:
+                    value = upper if clamp else NAN
+                elif value in (INF, -INF):
+                    value = NAN
+                values.append(value)
+            start += count
+        rejected = sum(1 for value in values if value != value)
+        if rejected:
+            logger.warning('%d of %d values are unknown or out of bounds',
+                           rejected, len(values))
+        return values
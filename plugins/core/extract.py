@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import os
+
+from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
+
+logger = logging.getLogger('uanpps-extract')
+
+
+def get_default_parser():
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return 'html.parser'
+    return 'lxml'
+
+HTML_PARSER = os.environ.get('uanpps_html_parser', get_default_parser())
+
+
+def attr_matches(name, value, expected):
+    if value is None:
+        return False
+    if name == 'class':
+        # multi-valued attribute, not yet split by the tree builder
+        if not isinstance(value, (list, tuple)):
+            value = value.split()
+        return expected in value
+    return value == expected
+
+
+def selector_matches(selector, name, attrs):
+    selector_name, selector_attrs = selector
+    if name != selector_name:
+        return False
+    for attr, expected in (selector_attrs or {}).items():
+        if not attr_matches(attr, attrs.get(attr), expected):
+            return False
+    return True
+
+
+def extract_blocks(markup, selectors, parser=HTML_PARSER):
+    # Build a tree of the requested containers only (every other element
+    # of the page is skipped by the tree builder) and return the first
+    # match of each (name, attrs) selector, in order.
+    strainer = SoupStrainer(lambda name, attrs: any(
+        selector_matches(selector, name, attrs) for selector in selectors))
+    soup = BeautifulSoup(markup, parser, parse_only=strainer)
+    return [soup.find(name, attrs or {}) for name, attrs in selectors]
+
+
+def extract_block(markup, name, attrs=None, parser=HTML_PARSER):
+    return extract_blocks(markup, [(name, attrs)], parser)[0]
+
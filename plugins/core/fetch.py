@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import ast
+import logging
+import os
+import threading
+import urllib
+
+from core.cache import ResponseCache
+from core.instrument import Instruments
+from core.loop import FetchError
+from core.loop import FetchLoop
+from core.replay import RECORD_DIR
+from core.replay import REPLAY_DIR
+from core.replay import record_response
+from core.scheduler import CircuitOpenError
+from core.scheduler import HostScheduler
+from core.utils import get_session
+from core.utils import get_timeout
+
+logger = logging.getLogger('uanpps-fetch')
+
+# `uanpps_cache=False` fetches every page, e.g. to record or benchmark
+RESPONSE_CACHE = (ResponseCache() if ast.literal_eval(
+    os.environ.get('uanpps_cache', 'True')) else None)
+HOST_SCHEDULER = HostScheduler()
+CHUNK_SIZE = 16 * 1024
+# `threads` (requests, a thread per page) or `loop` (a single event loop
+# thread for every page of the process)
+FETCH_BACKEND = os.environ.get('uanpps_fetch_backend', 'threads')
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def build_url(url, params=None):
+    if not params:
+        return url
+    return '{}?{}'.format(url, urllib.urlencode(sorted(params.items())))
+
+
+def read_body(response, consumer):
+    # hand the chunks to the consumer and stop once it has all it needs
+    chunks = []
+    for chunk in response.iter_content(CHUNK_SIZE):
+        chunks.append(chunk)
+        if consumer(chunk):
+            response.close()
+            break
+    return b''.join(chunks)
+
+
+def download(url, headers, timeout, instruments, consumer=None):
+    with HOST_SCHEDULER.request(url):
+        # the body is read separately to tell waiting from downloading
+        with instruments.timer('wait'):
+            response = get_session().get(url, headers=headers,
+                                         timeout=timeout, stream=True)
+        with instruments.timer('download'):
+            if consumer and response.status_code == 200:
+                content = read_body(response, consumer)
+            else:
+                content = response.content
+        instruments.count('bytes', len(content))
+        if RECORD_DIR and response.status_code == 200:
+            record_response(RECORD_DIR, url, response.status_code,
+                            response.headers, content)
+        if response.status_code == 304:
+            return 304, None, response.headers
+        response.raise_for_status()
+        return response.status_code, content, response.headers
+
+
+def get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = FetchLoop(HOST_SCHEDULER.concurrency)
+        return _loop
+
+
+def check_cache(url, headers, cache, instruments):
+    # (fresh body or None, cache entry, request headers)
+    headers = dict(headers or {})
+    entry = cache.load(url) if cache else None
+    if entry:
+        if cache.is_fresh(entry):
+            logger.debug('Cache hit: %s', url)
+            instruments.count('cached')
+            return entry['body'], entry, headers
+        headers.update(cache.get_validators(entry))
+    return None, entry, headers
+
+
+def store_page(url, entry, status, body, info, cache, instruments):
+    # a page that can not be cached is still returned
+    try:
+        if status == 304 and entry:
+            logger.debug('Not modified: %s', url)
+            instruments.count('cached')
+            body = entry['body']
+            cache.refresh(entry)
+        elif cache and body is not None:
+            cache.store(url, body, info.get('ETag'),
+                        info.get('Last-Modified'))
+    except (IOError, OSError):
+        logger.exception('Failed to cache %s', url)
+    return body
+
+
+def fetch_page(url, headers=None, timeout=None, cache=RESPONSE_CACHE,
+               instruments=None, consumer=None):
+    # `consumer` is fed the body chunks of a 200 response as they arrive;
+    # once it returns True the rest of the body is not downloaded
+    timeout = timeout or get_timeout()
+    instruments = instruments or Instruments()
+    body, entry, headers = check_cache(url, headers, cache, instruments)
+    if body is not None:
+        return body
+    status, body, info = download(url, headers, timeout, instruments,
+                                  consumer)
+    return store_page(url, entry, status, body, info, cache, instruments)
+
+
+def try_fetch_page(url, headers=None, timeout=None, instruments=None,
+                   consumer=None):
+    try:
+        return fetch_page(url, headers, timeout, instruments=instruments,
+                          consumer=consumer)
+    except CircuitOpenError as error:
+        logger.warning('Skip %s: %s', url, error)
+        return None
+    except Exception:
+        logger.exception('Failed to fetch %s', url)
+        return None
+
+
+def fetch_pages_loop(urls, headers=None, timeout=None, cache=RESPONSE_CACHE,
+                     instruments=None, consumers=None):
+    timeout = timeout or get_timeout()
+    instruments = instruments or Instruments()
+    consumers = consumers or [None] * len(urls)
+    bodies = [None] * len(urls)
+
+    requests = []
+    for index, (url, consumer) in enumerate(zip(urls, consumers)):
+        try:
+            body, entry, page_headers = check_cache(url, headers, cache,
+                                                    instruments)
+            if body is not None:
+                bodies[index] = body
+                continue
+            state, _ = HOST_SCHEDULER.open_request(url)
+        except CircuitOpenError as error:
+            logger.warning('Skip %s: %s', url, error)
+            continue
+        requests.append((index, url, entry, state,
+                         get_loop().submit(url, page_headers, timeout,
+                                           consumer)))
+
+    for index, url, entry, state, pending in requests:
+        try:
+            status, info, body, _ = pending.wait()
+            instruments.add_time('wait', pending.headers_at - pending.started)
+            instruments.add_time('download',
+                                 pending.finished - pending.headers_at)
+            instruments.count('bytes', len(body))
+            if RECORD_DIR and status == 200:
+                record_response(RECORD_DIR, url, status, info, body)
+            if status >= 400:
+                raise FetchError('{} Error for url: {}'.format(status, url))
+        except Exception:
+            HOST_SCHEDULER.record_failure(state)
+            logger.exception('Failed to fetch %s', url)
+            continue
+        HOST_SCHEDULER.record_success(state,
+                                      pending.finished - pending.started)
+        try:
+            bodies[index] = store_page(url, entry, status,
+                                       None if status == 304 else body,
+                                       info, cache, instruments)
+        except Exception:
+            logger.exception('Failed to fetch %s', url)
+    return bodies
+
+
+def fetch_pages(urls, headers=None, timeout=None, instruments=None,
+                consumers=None):
+    # Issue all requests at once, so a run takes as long as the slowest
+    # page. A page that can not be fetched is returned as None.
+    if FETCH_BACKEND == 'loop' and not REPLAY_DIR:
+        return fetch_pages_loop(urls, headers, timeout,
+                                instruments=instruments, consumers=consumers)
+    consumers = consumers or [None] * len(urls)
+    bodies = [None] * len(urls)
+
+    def fetch(index, url, consumer):
+        bodies[index] = try_fetch_page(url, headers, timeout, instruments,
+                                       consumer)
+
+    # plain threads: a pool's handler threads add up to 0.1 s on shutdown
+    threads = [threading.Thread(target=fetch, args=(index, url, consumer))
+               for index, (url, consumer) in enumerate(zip(urls,
+                                                           consumers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return bodies
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import ast
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+
+from core import ROOT_PATH
+from core import ensure_dir
+from core.extract import attr_matches
+
+logger = logging.getLogger('uanpps-fingerprint')
+
+MEMO_DIR = os.environ.get('uanpps_memo_dir',
+                          os.path.join(ROOT_PATH, 'cache', 'extracted'))
+# `uanpps_memo=False` parses every page, e.g. to benchmark the parsing
+MEMO_ENABLED = ast.literal_eval(os.environ.get('uanpps_memo', 'True'))
+
+TAG_END = (b' ', b'\t', b'\r', b'\n', b'>', b'/')
+ATTRIBUTE = re.compile(r'([^\s=/>]+)\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)')
+
+
+def find_tag(lowered, tag, start, end):
+    # the next `<tag` (not a longer tag name) between start and end
+    while True:
+        position = lowered.find(tag, start, end)
+        if position < 0 or lowered[position + len(tag):
+                                   position + len(tag) + 1] in TAG_END:
+            return position
+        start = position + len(tag)
+
+
+def get_attributes(tag):
+    # the attributes of a start tag given as text
+    return dict((name.lower(), value.strip('"\''))
+                for name, value in ATTRIBUTE.findall(tag))
+
+
+def find_start(body, lowered, selector):
+    # Position of the start tag of the first element matching the selector,
+    # as BeautifulSoup's find() matches it (a class is one of the tokens of
+    # the class attribute). Every matching start tag holds the text of the
+    # selector's attribute values, so only the tags around that text are
+    # looked at.
+    name, attrs = selector
+    if not attrs:
+        return -1
+    open_tag = '<{}'.format(name).encode('ascii')
+    key = 'id' if 'id' in attrs else sorted(attrs)[0]
+    needle = attrs[key].encode('utf-8')
+    position = body.find(needle)
+    while position >= 0:
+        # the text must be inside a start tag of the selector's name
+        start = lowered.rfind(b'<', 0, position)
+        end = lowered.find(b'>', position)
+        if start >= 0 and end >= 0 and \
+                lowered.find(b'>', start, position) < 0 and \
+                find_tag(lowered, open_tag, start, position) == start:
+            found = get_attributes(body[start + len(open_tag):end].decode(
+                'utf-8', 'replace'))
+            if all(attr_matches(attr, found.get(attr), expected)
+                   for attr, expected in attrs.items()):
+                return start
+        position = body.find(needle, position + len(needle))
+    return -1
+
+
+def find_span(body, lowered, selector):
+    # Byte span of the first element matching the selector, from its start
+    # tag to the matching end tag, found by substring search only; None when
+    # the element cannot be told apart without parsing
+    name, _ = selector
+    start = find_start(body, lowered, selector)
+    if start < 0:
+        return None
+    open_tag = '<{}'.format(name).encode('ascii')
+    close_tag = '</{}'.format(name).encode('ascii')
+    depth = 1
+    position = start + len(open_tag)
+    while depth:
+        close = find_tag(lowered, close_tag, position, len(lowered))
+        if close < 0:
+            # unclosed, e.g. a streamed prefix: the rest of the page counts
+            return start, len(body)
+        nested = find_tag(lowered, open_tag, position, close)
+        if nested >= 0:
+            depth += 1
+            position = nested + len(open_tag)
+        else:
+            depth -= 1
+            position = close + len(close_tag)
+    end = lowered.find(b'>', position)
+    return start, len(body) if end < 0 else end + 1
+
+
+def get_fingerprint(body, selectors, salt=''):
+    # hash of the regions of the page the blocks are read from, or of the
+    # whole page when a region is not found
+    fingerprint = hashlib.sha1(salt.encode('utf-8'))
+    lowered = body.lower()
+    spans = [find_span(body, lowered, selector) for selector in selectors]
+    if None in spans:
+        fingerprint.update(body)
+    else:
+        for start, end in spans:
+            fingerprint.update(body[start:end])
+    return fingerprint.hexdigest()
+
+
+class ExtractMemo(object):
+    # The values last extracted from every page URL, with the fingerprint
+    # of the page and the time the extraction took. Entries are kept in the
+    # process and as one JSON file per URL, replaced atomically.
+
+    def __init__(self, directory=MEMO_DIR):
+        self.directory = directory
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get_path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + '.json')
+
+    def load(self, url):
+        try:
+            with io.open(self.get_path(url), encoding='utf-8') as memo_file:
+                entry = json.load(memo_file)
+        except (IOError, OSError, ValueError):
+            return None
+        return entry if entry.get('url') == url else None
+
+    def get(self, url, fingerprint):
+        with self.lock:
+            entry = self.entries.get(url)
+        if entry is None:
+            entry = self.load(url)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return None
+        with self.lock:
+            self.entries[url] = entry
+        return entry
+
+    def put(self, url, fingerprint, values, cost):
+        entry = {
+            'url': url,
+            'fingerprint': fingerprint,
+            'values': values,
+            'cost': cost
+        }
+        with self.lock:
+            self.entries[url] = entry
+        try:
+            ensure_dir(self.directory)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                            suffix='.tmp')
+            with os.fdopen(fd, 'wb') as memo_file:
+                memo_file.write(json.dumps(entry).encode('utf-8'))
+            os.rename(tmp_path, self.get_path(url))
+        except (IOError, OSError, TypeError, ValueError):
+            logger.exception('Failed to store the values of %s', url)
+
+
+EXTRACT_MEMO = ExtractMemo() if MEMO_ENABLED else None
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import functools
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# stages drawn in the `<station>_scrape_timing` graphs: the whole fetch,
+# the time to the response headers (DNS, connect, TLS and the server) and
+# the body download summed over the pages, then parsing and output, and
+# the parsing time saved on unchanged pages
+STAGES = ('fetch', 'wait', 'download', 'parse', 'output', 'saved')
+
+
+class Instruments(object):
+    # Stage timers and counters of one run. Pages are fetched from several
+    # threads, so updates are serialized; timers of the same stage add up.
+
+    def __init__(self):
+        self.timings = OrderedDict()
+        self.counters = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.time() - started)
+
+    def describe(self):
+        return ', '.join(
+            ['{} {:.3f} s'.format(stage, seconds)
+             for stage, seconds in self.timings.items()] +
+            ['{} {}'.format(name, value)
+             for name, value in self.counters.items()])
+
+
+def timed(stage):
+    # times a method of an object holding its `instruments`
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.instruments.timer(stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_timing_values(graph_id, instruments):
+    lines = ['multigraph {}\n'.format(graph_id)]
+    for stage in STAGES:
+        lines.append('{}.value {:.3f}\n'.format(
+            stage, instruments.timings.get(stage, 0.0)))
+    return ''.join(lines)
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import atexit
+import errno
+import io
+import logging
+import os
+import select
+import socket
+import ssl
+import threading
+import time
+import urlparse
+
+from collections import deque
+from httplib import HTTPMessage
+
+logger = logging.getLogger('uanpps-loop')
+
+CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+DNS_TTL = 300
+
+READ = 'read'
+WRITE = 'write'
+
+WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK)
+CONNECTING = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+
+class FetchError(IOError):
+    pass
+
+
+class ResponseParser(object):
+    # Incremental HTTP/1.1 response parser: bytes are fed as they arrive and
+    # body chunks (de-chunked) are handed to `on_chunk` right away; when it
+    # returns True the response ends there.
+
+    def __init__(self, on_chunk=None):
+        self.on_chunk = on_chunk
+        self.buffer = b''
+        self.status = None
+        self.headers = None
+        self.body = []
+        self.done = False
+        self.chunked = False
+        self.chunk_left = None
+        self.remaining = None
+
+    def feed(self, data):
+        if not data:
+            # a body without length or chunks ends with the connection
+            if (self.headers is not None and not self.chunked and
+                    self.remaining is None):
+                self.done = True
+                return
+            raise FetchError('Connection closed before the response ended')
+        self.buffer += data
+        if self.headers is None and not self.parse_headers():
+            return
+        self.parse_body()
+
+    def parse_headers(self):
+        end = self.buffer.find(b'\r\n\r\n')
+        if end < 0:
+            return False
+        head, self.buffer = self.buffer[:end + 2], self.buffer[end + 4:]
+        status_line, _, header_lines = head.partition(b'\r\n')
+        try:
+            self.status = int(status_line.split(None, 2)[1])
+        except (IndexError, ValueError):
+            raise FetchError('Invalid status line: {!r}'.format(status_line))
+        if self.status == 100:
+            # interim response, the real one follows
+            return bool(self.buffer) and self.parse_headers()
+        self.headers = HTTPMessage(io.BytesIO(header_lines))
+        if self.status != 200:
+            # only the body of a final, successful response is streamed
+            self.on_chunk = None
+
+        if self.status in (204, 304):
+            self.done = True
+        elif 'chunked' in self.headers.get('transfer-encoding', '').lower():
+            self.chunked = True
+        elif self.headers.get('content-length') is not None:
+            self.remaining = int(self.headers['content-length'])
+            self.done = self.remaining == 0
+        return True
+
+    def emit(self, data):
+        self.body.append(data)
+        if self.on_chunk is not None and self.on_chunk(data):
+            # the consumer has read all it needs, drop the connection
+            self.done = True
+
+    def parse_body(self):
+        if self.done:
+            return
+        if self.chunked:
+            self.parse_chunks()
+        elif self.remaining is not None:
+            data = self.buffer[:self.remaining]
+            self.buffer = self.buffer[len(data):]
+            self.remaining -= len(data)
+            self.done = self.remaining == 0
+            if data:
+                self.emit(data)
+        elif self.buffer:
+            data, self.buffer = self.buffer, b''
+            self.emit(data)
+
+    def parse_chunks(self):
+        while not self.done:
+            if self.chunk_left is None:
+                end = self.buffer.find(b'\r\n')
+                if end < 0:
+                    return
+                size = self.buffer[:end].split(b';', 1)[0].strip()
+                self.buffer = self.buffer[end + 2:]
+                try:
+                    self.chunk_left = int(size, 16)
+                except ValueError:
+                    raise FetchError('Invalid chunk size: {!r}'.format(size))
+                if self.chunk_left == 0:
+                    # trailers are not needed, the connection is closed
+                    self.done = True
+                    return
+            elif self.chunk_left:
+                data = self.buffer[:self.chunk_left]
+                if not data:
+                    return
+                self.buffer = self.buffer[len(data):]
+                self.chunk_left -= len(data)
+                self.emit(data)
+            else:
+                # the CRLF after the chunk data
+                if len(self.buffer) < 2:
+                    return
+                self.buffer = self.buffer[2:]
+                self.chunk_left = None
+
+    def get_body(self):
+        return b''.join(self.body)
+
+
+class Pending(object):
+    # The result of a submitted request, set by the loop thread
+
+    def __init__(self, url):
+        self.url = url
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.started = None
+        self.headers_at = None
+        self.finished = None
+
+    def set_result(self, result):
+        self.result = result
+        self.finished = time.time()
+        self.event.set()
+
+    def set_error(self, error):
+        self.error = error
+        self.event.set()
+
+    def wait(self):
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class Task(object):
+    __slots__ = ('pending', 'host', 'coroutine', 'sock', 'event', 'deadline')
+
+    def __init__(self, pending, host, coroutine):
+        self.pending = pending
+        self.host = host
+        self.coroutine = coroutine
+        self.sock = None
+        self.event = None
+        self.deadline = None
+
+
+class FetchLoop(object):
+    # A single thread multiplexing every request of the process over
+    # non-blocking sockets. Any thread submits requests and waits for their
+    # Pending results; at most `concurrency` requests run against one host,
+    # the others wait in the host's queue. Every request uses its own
+    # connection (`Connection: close`).
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.lock = threading.Lock()
+        self.incoming = deque()
+        self.queued = {}
+        self.active = {}
+        self.tasks = set()
+        self.addresses = {}
+        self.thread = None
+        self.stopping = False
+        self.wake_read, self.wake_write = os.pipe()
+
+    def submit(self, url, headers, timeout, on_chunk=None):
+        pending = Pending(url)
+        with self.lock:
+            self.incoming.append((pending, headers, timeout, on_chunk))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run,
+                                               name='uanpps-loop')
+                self.thread.daemon = True
+                self.thread.start()
+                # stop the thread before the interpreter tears modules down
+                atexit.register(self.stop)
+        os.write(self.wake_write, b'.')
+        return pending
+
+    def stop(self):
+        # requests still running are abandoned
+        self.stopping = True
+        os.write(self.wake_write, b'.')
+        self.thread.join(1)
+
+    def resolve(self, host, port):
+        key = (host, port)
+        now = time.time()
+        cached = self.addresses.get(key)
+        if cached is None or cached[0] < now:
+            info = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+            cached = (now + DNS_TTL, info[0])
+            self.addresses[key] = cached
+        return cached[1]
+
+    def exchange(self, task, url, headers, timeout, on_chunk):
+        # coroutine of one request: yields the socket event it waits for,
+        # follows redirects and sets the result
+        connect_timeout, read_timeout = timeout
+        pending = task.pending
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlparse.urlsplit(url)
+            https = parts.scheme == 'https'
+            port = parts.port or (443 if https else 80)
+            family, socktype, proto, _, address = self.resolve(
+                parts.hostname, port)
+
+            sock = socket.socket(family, socktype, proto)
+            sock.setblocking(False)
+            task.sock = sock
+            try:
+                code = sock.connect_ex(address)
+                if code not in (0,) + CONNECTING:
+                    raise socket.error(code, os.strerror(code))
+                if code:
+                    yield WRITE, connect_timeout
+                    code = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if code:
+                        raise socket.error(code, os.strerror(code))
+
+                if https:
+                    context = ssl.create_default_context()
+                    sock = context.wrap_socket(sock,
+                                               server_hostname=parts.hostname,
+                                               do_handshake_on_connect=False)
+                    task.sock = sock
+                    while True:
+                        try:
+                            sock.do_handshake()
+                            break
+                        except ssl.SSLWantReadError:
+                            yield READ, connect_timeout
+                        except ssl.SSLWantWriteError:
+                            yield WRITE, connect_timeout
+
+                path = parts.path or '/'
+                if parts.query:
+                    path += '?' + parts.query
+                lines = ['GET {} HTTP/1.1'.format(path),
+                         'Host: {}'.format(parts.netloc.rpartition('@')[2]),
+                         'Connection: close',
+                         'Accept-Encoding: identity']
+                for name, value in headers.items():
+                    header = '{}: {}'.format(name, value)
+                    # as requests does, a header never spans lines
+                    if '\r' in header or '\n' in header:
+                        raise FetchError(
+                            'Invalid header: {!r}'.format(header))
+                    lines.append(header)
+                data = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+                while data:
+                    try:
+                        data = data[sock.send(data):]
+                    except ssl.SSLWantWriteError:
+                        yield WRITE, read_timeout
+                    except socket.error as error:
+                        if error.errno not in WOULD_BLOCK:
+                            raise
+                        yield WRITE, read_timeout
+
+                parser = ResponseParser(on_chunk)
+                while not parser.done:
+                    try:
+                        chunk = sock.recv(CHUNK_SIZE)
+                    except ssl.SSLWantReadError:
+                        yield READ, read_timeout
+                        continue
+                    except socket.error as error:
+                        if error.errno not in WOULD_BLOCK:
+                            raise
+                        yield READ, read_timeout
+                        continue
+                    parser.feed(chunk)
+                    if parser.headers is not None and \
+                            pending.headers_at is None:
+                        pending.headers_at = time.time()
+            finally:
+                sock.close()
+                task.sock = None
+
+            location = parser.headers.get('location')
+            if parser.status in REDIRECT_STATUSES and location:
+                url = urlparse.urljoin(url, location)
+                pending.headers_at = None
+                continue
+            pending.set_result((parser.status, parser.headers,
+                                parser.get_body(), url))
+            return
+        raise FetchError('Too many redirects: {}'.format(pending.url))
+
+    def start_task(self, pending, headers, timeout, on_chunk):
+        host = urlparse.urlsplit(pending.url).netloc
+        if self.active.get(host, 0) >= self.concurrency:
+            self.queued.setdefault(host, deque()).append(
+                (pending, headers, timeout, on_chunk))
+            return
+        self.active[host] = self.active.get(host, 0) + 1
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        task = Task(pending, host, None)
+        task.coroutine = self.exchange(task, pending.url, headers, timeout,
+                                       on_chunk)
+        pending.started = time.time()
+        self.tasks.add(task)
+        self.step(task)
+
+    def finish_task(self, task):
+        self.tasks.discard(task)
+        self.active[task.host] -= 1
+        queue = self.queued.get(task.host)
+        if queue:
+            self.start_task(*queue.popleft())
+
+    def step(self, task, error=None):
+        try:
+            if error is None:
+                event, timeout = next(task.coroutine)
+            else:
+                event, timeout = task.coroutine.throw(error)
+        except StopIteration:
+            self.finish_task(task)
+            return
+        except Exception as error:
+            task.pending.set_error(error)
+            self.finish_task(task)
+            return
+        task.event = event
+        task.deadline = time.time() + timeout
+
+    def run(self):
+        while not self.stopping:
+            with self.lock:
+                incoming, self.incoming = self.incoming, deque()
+            for request in incoming:
+                self.start_task(*request)
+
+            readers = [self.wake_read]
+            writers = []
+            for task in self.tasks:
+                (readers if task.event == READ else writers).append(task.sock)
+            deadline = min([task.deadline for task in self.tasks] or [None])
+            wait = None if deadline is None else max(deadline - time.time(),
+                                                     0)
+            try:
+                readable, writable, _ = select.select(readers, writers, [],
+                                                      wait)
+            except select.error as error:
+                if error.args[0] == errno.EINTR:
+                    continue
+                raise
+            if self.wake_read in readable:
+                os.read(self.wake_read, 4096)
+
+            ready = set(readable) | set(writable)
+            now = time.time()
+            for task in list(self.tasks):
+                if task.sock in ready:
+                    self.step(task)
+                elif task.deadline <= now:
+                    self.step(task, socket.timeout(
+                        'Timed out: {}'.format(task.pending.url)))
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import sys
+
+
+class MuninWriter(object):
+    # Buffer for the output of a run, which the plugin writes to stdout with
+    # a single call. Text is checked against the output encoding as it is
+    # added, so encoding errors are raised where print() would raise them.
+
+    def __init__(self, encoding=None):
+        self.encoding = (encoding or getattr(sys.stdout, 'encoding', None) or
+                         sys.getdefaultencoding())
+        self.chunks = []
+
+    def write(self, text):
+        text.encode(self.encoding)
+        self.chunks.append(text)
+
+    def getvalue(self):
+        return ''.join(self.chunks)
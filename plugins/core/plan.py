@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import threading
+
+from operator import itemgetter
+
+from core.convert import ConversionBatch
+from core.convert import get_conversion
+
+logger = logging.getLogger('uanpps-plan')
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def compile_getter(field, index):
+    # C-level item getters; a dotted parameter reads nested dicts
+    if 'parameter' not in field:
+        return itemgetter(index)
+    keys = field['parameter'].split('.')
+    if len(keys) == 1:
+        return itemgetter(keys[0])
+    getters = [itemgetter(key) for key in keys]
+
+    def get_value(data):
+        for getter in getters:
+            data = getter(data)
+        return data
+
+    return get_value
+
+
+class MappingPlan(object):
+    # A graph config compiled once into the '<field>.value ' prefix and the
+    # getter of every field, and the graph's conversion (ratio and bounds).
+    # A field with a `parameter` reads that (dotted) key, the others read
+    # the item at their position from a list, or the scalar itself.
+    __slots__ = ('graph_id', 'fields', 'conversion')
+
+    def __init__(self, config, ratio=None):
+        self.graph_id = config['id']
+        self.fields = tuple(
+            ('{}.value '.format(field['id']), field,
+             compile_getter(field, index), 'parameter' not in field)
+            for index, field in enumerate(config['fields']))
+        self.conversion = get_conversion(config, ratio)
+
+    def apply(self, data):
+        # [(value prefix, field)] and [raw value] of the fields with a
+        # number; a missing value ends the graph
+        scalar = not isinstance(data, list)
+        entries = []
+        values = []
+        for prefix, field, get_value, positional in self.fields:
+            if positional and scalar:
+                value = data
+            else:
+                try:
+                    value = get_value(data)
+                except (IndexError, KeyError, TypeError):
+                    if positional:
+                        logger.error('Mismatch data for field \'%s\': %s',
+                                     field['id'], data)
+                    else:
+                        logger.error('Parameter \'%s\' is missing',
+                                     field['parameter'])
+                    break
+            # the sites print decimals with a comma
+            if isinstance(value, basestring):
+                value = value.replace(',', '.')
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                logger.exception('Invalid value for field \'%s\': %s',
+                                 field['id'], value)
+                continue
+            entries.append((prefix, field))
+            values.append(value)
+        return entries, values
+
+
+def get_plan(config, ratio=None):
+    # plans are compiled once per process and graph
+    key = (config['id'], ratio)
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is None:
+            plan = _plans[key] = MappingPlan(config, ratio)
+    return plan
+
+
+def convert_mapped(mapped):
+    # [(plan, entries, raw values)] -> [(graph id, entries, values)]; the
+    # values of all the graphs are converted in one batch
+    batch = ConversionBatch()
+    for plan, _, values in mapped:
+        batch.extend(values, plan.conversion)
+    converted = batch.convert()
+    results = []
+    start = 0
+    for plan, entries, values in mapped:
+        results.append((plan.graph_id, entries,
+                        converted[start:start + len(values)]))
+        start += len(values)
+    return results
+
+
+def apply_plans(plans, payload):
+    # every graph of a station over one parsed payload (target -> data):
+    # [(graph id, [(value prefix, field)], [value])]
+    mapped = []
+    for target, plan in plans:
+        data = payload.get(target)
+        if data is None:
+            logger.error('No data for graph \'%s\'', plan.graph_id)
+            continue
+        entries, values = plan.apply(data)
+        mapped.append((plan, entries, values))
+    return convert_mapped(mapped)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import logging
+import os
+
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+from requests.models import PreparedRequest
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from core import ensure_dir
+
+logger = logging.getLogger('uanpps-replay')
+
+# fetched pages are written to the record directory, and served from the
+# replay directory instead of the network
+RECORD_DIR = os.environ.get('uanpps_record_dir')
+REPLAY_DIR = os.environ.get('uanpps_replay_dir')
+
+FIXTURE_SUFFIX = '.page'
+
+# A fixture is a single file per URL: a JSON header line (url, status and
+# response headers) followed by the raw body.
+
+
+def normalize_url(url):
+    # the URL as requests sends it, e.g. a bare host gets the path `/`
+    request = PreparedRequest()
+    request.prepare_url(url, None)
+    return request.url
+
+
+def get_fixture_path(directory, url):
+    key = hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()
+    return os.path.join(directory, key + FIXTURE_SUFFIX)
+
+
+def record_response(directory, url, status, headers, body):
+    ensure_dir(directory)
+    meta = {'url': normalize_url(url), 'status': status,
+            'headers': dict(headers)}
+    path = get_fixture_path(directory, url)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with io.open(tmp_path, 'wb') as fixture_file:
+        fixture_file.write(json.dumps(meta).encode('utf-8') + b'\n')
+        fixture_file.write(body)
+    os.rename(tmp_path, path)
+    logger.debug('Recorded %s', url)
+
+
+def load_fixture(directory, url):
+    try:
+        with io.open(get_fixture_path(directory, url), 'rb') as fixture_file:
+            meta = json.loads(fixture_file.readline().decode('utf-8'))
+            body = fixture_file.read()
+    except (IOError, OSError, ValueError):
+        return None
+    if meta.get('url') != normalize_url(url):
+        return None
+    return meta, body
+
+
+class ReplayAdapter(BaseAdapter):
+    # Transport answering every request from the recorded fixtures; a page
+    # that was not recorded fails like an unreachable host.
+
+    def __init__(self, directory=REPLAY_DIR):
+        super(ReplayAdapter, self).__init__()
+        self.directory = directory
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        fixture = load_fixture(self.directory, request.url)
+        if fixture is None:
+            raise ConnectionError('No fixture for {}'.format(request.url),
+                                  request=request)
+        meta, body = fixture
+
+        response = Response()
+        response.status_code = meta['status']
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(body)
+        response.reason = 'Replayed'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
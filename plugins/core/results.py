@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import fcntl
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+from contextlib import contextmanager
+
+from core import ROOT_PATH
+from core import ensure_dir
+from core import setup_logging
+
+logger = logging.getLogger('uanpps-results')
+
+RESULTS_DIR = os.environ.get('uanpps_results_dir',
+                             os.path.join(ROOT_PATH, 'results'))
+RESULTS_MAX_AGE = int(os.environ.get('uanpps_results_max_age', 600))
+# a plugin's own scrape is reused by the plugin runs within this many seconds
+RESULTS_FRESH = int(os.environ.get('uanpps_results_fresh', 60))
+
+# A result is a snapshot file: one JSON line of metadata followed by the
+# munin values. `max_age` is only set by the daemon, which owns scraping;
+# a plugin then reports its stale values as unknown instead of scraping.
+
+
+def get_result_path(name):
+    return os.path.join(RESULTS_DIR, '{}.txt'.format(name))
+
+
+def write_result(name, text, max_age=None):
+    ensure_dir(RESULTS_DIR)
+    path = get_result_path(name)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    meta = {'station': name, 'updated': time.time(), 'max_age': max_age}
+    with io.open(tmp_path, 'w', encoding='utf-8') as result_file:
+        result_file.write(json.dumps(meta) + '\n')
+        result_file.write(text)
+    # readers never see a half-written file
+    os.rename(tmp_path, path)
+
+
+def load_result(name):
+    try:
+        with io.open(get_result_path(name), 'rb') as result_file:
+            meta = json.loads(result_file.readline().decode('utf-8'))
+            return meta, result_file.read()
+    except (IOError, OSError, ValueError):
+        return None, None
+
+
+def get_unknown_values(values):
+    lines = []
+    for line in values.splitlines():
+        field, separator, _ = line.partition(b'.value ')
+        lines.append(field + b'.value U' if separator else line)
+    return b'\n'.join(lines) + b'\n'
+
+
+@contextmanager
+def station_lock(name):
+    # without a usable results directory the run goes on unlocked
+    try:
+        ensure_dir(RESULTS_DIR)
+        lock_file = open(os.path.join(RESULTS_DIR, '{}.lock'.format(name)),
+                         'a')
+    except (IOError, OSError):
+        setup_logging()
+        logger.exception('Failed to lock %s', name)
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def load_memo(name, fresh, since=None):
+    # the memoized values when written within `fresh` seconds or after
+    # `since`
+    meta, values = load_result('{}.memo'.format(name))
+    if meta is None:
+        return None
+    if time.time() - meta['updated'] > fresh and (
+            since is None or meta['updated'] < since):
+        return None
+    return values.decode('utf-8')
+
+
+def get_memoized_result(name, scrape, fresh=RESULTS_FRESH):
+    # Plugin runs without a collector that overlap (several munin masters,
+    # munin-run) scrape the station once: the first run scrapes under the
+    # station's lock, the runs waiting on the lock read what it wrote.
+    values = load_memo(name, fresh)
+    if values is not None:
+        return values
+    requested = time.time()
+    with station_lock(name):
+        values = load_memo(name, fresh, requested)
+        if values is None:
+            values = scrape()
+            # a failed scrape is not shared, the next run tries again
+            if values:
+                try:
+                    write_result('{}.memo'.format(name), values)
+                except (IOError, OSError):
+                    setup_logging()
+                    logger.exception('Failed to memoize the values of %s',
+                                     name)
+        else:
+            logger.info('Reused the values of %s scraped by another run',
+                        name)
+    return values
+
+
+def print_result(name, max_age=RESULTS_MAX_AGE):
+    meta, values = load_result(name)
+    if meta is None:
+        return False
+
+    # aggregated samples of the high-resolution mode come first, for the
+    # graphs and fields of the latest result; the store is only loaded in
+    # that mode
+    if os.environ.get('uanpps_samples_mode'):
+        from core.samples import parse_values
+        from core.samples import print_samples
+
+        if print_samples(parse_values(values.decode('utf-8'))):
+            return True
+
+    age = time.time() - meta['updated']
+
+    if meta.get('max_age') is None:
+        # written by the collector: scrape directly when it stopped running
+        if age > max_age:
+            setup_logging()
+            logger.warning('Result for %s is outdated (%d s)', name, age)
+            return False
+    elif age > meta['max_age']:
+        setup_logging()
+        logger.warning('Snapshot for %s is outdated (%d s)', name, age)
+        values = get_unknown_values(values)
+
+    sys.stdout.write(values)
+    return True
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import math
+import os
+import sys
+import time
+
+from collections import OrderedDict
+
+from core.tsdb import AGGREGATES
+from core.tsdb import TimeSeriesStore
+
+logger = logging.getLogger('uanpps-samples')
+
+# an aggregate of core.tsdb (`avg`, `min`, `max`, ...) or `all` (every
+# sample as `field.value epoch:value`)
+SAMPLES_MODE = os.environ.get('uanpps_samples_mode', '')
+SAMPLES_WINDOW = int(os.environ.get('uanpps_samples_window', 300))
+
+STORE = TimeSeriesStore()
+
+
+def parse_values(text):
+    graphs = OrderedDict()
+    values = None
+    for line in text.splitlines():
+        if line.startswith('multigraph '):
+            graph_id = line[len('multigraph '):]
+            values = graphs.setdefault(graph_id, OrderedDict())
+        elif values is not None and '.value ' in line:
+            field, value = line.split('.value ', 1)
+            try:
+                values[field] = float(value)
+            except ValueError:
+                continue
+    return graphs
+
+
+def append_samples(text, timestamp=None, store=STORE):
+    timestamp = time.time() if timestamp is None else timestamp
+    for graph_id, values in parse_values(text).items():
+        try:
+            store.append(graph_id, timestamp, values)
+        except (IOError, OSError):
+            logger.exception('Failed to store samples of %s', graph_id)
+
+
+def format_samples(graph_id, fields, times, columns, mode):
+    lines = ['multigraph {}\n'.format(graph_id)]
+    for field in fields:
+        samples = [(timestamp, value)
+                   for timestamp, value in zip(times, columns[field])
+                   if not math.isnan(value)]
+        if not samples:
+            continue
+        if mode == 'all':
+            lines.extend('{}.value {:.0f}:{:.2f}\n'.format(field, *sample)
+                         for sample in samples)
+        else:
+            value = AGGREGATES[mode]([value for _, value in samples])
+            lines.append('{}.value {:.2f}\n'.format(field, value))
+    return ''.join(lines)
+
+
+def print_samples(graphs, mode=SAMPLES_MODE, window=SAMPLES_WINDOW,
+                  store=STORE):
+    # `graphs` maps the station's graph ids to their field ids
+    if mode not in AGGREGATES and mode != 'all':
+        return False
+    stop = time.time()
+    output = []
+    for graph_id, fields in graphs.items():
+        try:
+            times, columns = store.query(graph_id, stop - window, stop,
+                                         list(fields))
+        except (IOError, OSError, ValueError):
+            logger.exception('Failed to read samples of %s', graph_id)
+            continue
+        if len(times):
+            output.append(format_samples(graph_id, fields, times, columns,
+                                         mode))
+    if not output:
+        return False
+    sys.stdout.write(''.join(output))
+    return True
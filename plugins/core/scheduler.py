@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import urlparse
+
+from core import ROOT_PATH
+from core import ensure_dir
+
+logger = logging.getLogger('uanpps-scheduler')
+
+HOSTS_DIR = os.environ.get('uanpps_hosts_dir',
+                           os.path.join(ROOT_PATH, 'cache', 'hosts'))
+HOST_CONCURRENCY = int(os.environ.get('uanpps_host_concurrency', 4))
+FAILURE_THRESHOLD = int(os.environ.get('uanpps_failure_threshold', 3))
+BACKOFF_BASE = float(os.environ.get('uanpps_backoff_base', 60))
+BACKOFF_MAX = float(os.environ.get('uanpps_backoff_max', 3600))
+
+# weight of the latest request in the latency and error rate averages
+SMOOTHING = 0.3
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class HostState(object):
+    __slots__ = ('host', 'latency', 'error_rate', 'failures', 'retry_at')
+
+    def __init__(self, host, latency=None, error_rate=0.0, failures=0,
+                 retry_at=0.0):
+        self.host = host
+        self.latency = latency
+        self.error_rate = error_rate
+        self.failures = failures
+        self.retry_at = retry_at
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def is_open(self, now):
+        return self.failures >= FAILURE_THRESHOLD and now < self.retry_at
+
+    def get_backoff(self):
+        # exponential backoff with equal jitter, so that several plugins
+        # do not retry a recovering site at the same moment
+        delay = min(BACKOFF_MAX,
+                    BACKOFF_BASE * 2 ** (self.failures - FAILURE_THRESHOLD))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def record_success(self, latency):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += SMOOTHING * (latency - self.latency)
+        self.error_rate -= SMOOTHING * self.error_rate
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def record_failure(self, now):
+        self.error_rate += SMOOTHING * (1 - self.error_rate)
+        self.failures += 1
+        if self.failures >= FAILURE_THRESHOLD:
+            self.retry_at = now + self.get_backoff()
+
+
+class HostScheduler(object):
+    # Tracks latency and errors of every upstream host, caps concurrent
+    # requests per host and stops requesting a failing host (circuit
+    # breaker) until its backoff expires. The state is kept on disk, so
+    # plugins started by munin share it between polls.
+
+    def __init__(self, directory=HOSTS_DIR, concurrency=HOST_CONCURRENCY):
+        self.directory = directory
+        self.concurrency = concurrency
+        self.states = {}
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def get_path(self, host):
+        return os.path.join(self.directory, host.replace(':', '_') + '.json')
+
+    def load_state(self, host):
+        try:
+            with io.open(self.get_path(host), encoding='utf-8') as state_file:
+                return HostState(**json.load(state_file))
+        except (IOError, OSError, ValueError, TypeError):
+            return HostState(host)
+
+    def store_state(self, state):
+        # the state stays in memory when it can not be shared, e.g. when
+        # munin runs the plugin as a user without write access
+        try:
+            ensure_dir(self.directory)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                            suffix='.tmp')
+            with os.fdopen(fd, 'wb') as state_file:
+                state_file.write(json.dumps(state.to_dict()).encode('utf-8'))
+            os.rename(tmp_path, self.get_path(state.host))
+        except (IOError, OSError):
+            logger.exception('Failed to store the state of %s', state.host)
+
+    def get_host(self, url):
+        with self.lock:
+            host = urlparse.urlparse(url).netloc
+            if host not in self.states:
+                self.states[host] = self.load_state(host)
+                self.semaphores[host] = threading.BoundedSemaphore(
+                    self.concurrency)
+            return self.states[host], self.semaphores[host]
+
+    def open_request(self, url):
+        # the host's state, unless its circuit is open
+        state, semaphore = self.get_host(url)
+        if state.is_open(time.time()):
+            raise CircuitOpenError('Circuit for {} is open for {:.0f} s'
+                                   .format(state.host,
+                                           state.retry_at - time.time()))
+        return state, semaphore
+
+    def record_success(self, state, latency):
+        with self.lock:
+            state.record_success(latency)
+            self.store_state(state)
+
+    def record_failure(self, state):
+        with self.lock:
+            state.record_failure(time.time())
+            self.store_state(state)
+        if state.is_open(time.time()):
+            logger.warning('Host %s failed %d times, retry in %.0f s',
+                           state.host, state.failures,
+                           state.retry_at - time.time())
+
+    @contextlib.contextmanager
+    def request(self, url):
+        state, semaphore = self.open_request(url)
+        with semaphore:
+            start = time.time()
+            try:
+                yield state
+            except Exception:
+                self.record_failure(state)
+                raise
+            self.record_success(state, time.time() - start)
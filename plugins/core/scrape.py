@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+
+from core.extract import extract_blocks
+from core.stream import BlockStream
+from core.stream import PageStream
+from core.fetch import build_url
+from core.fingerprint import get_fingerprint
+from core.plan import get_plan
+from core.utils import get_lists_of_values
+from core.utils import load_json
+
+logger = logging.getLogger('uanpps-scrape')
+
+SPEC_FILENAME = 'scrape.json'
+# the code extracting the values from a page: get_lists_of_values() is in
+# utils.py
+EXTRACT_FILES = [os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              name)
+                 for name in ('extract.py', 'scrape.py', 'stream.py',
+                              'utils.py')]
+
+_specs = {}
+_specs_lock = threading.Lock()
+_code_hash = None
+
+
+def get_code_hash():
+    global _code_hash
+    if _code_hash is None:
+        code_hash = hashlib.sha1()
+        for path in EXTRACT_FILES:
+            with io.open(path, 'rb') as code_file:
+                code_hash.update(code_file.read())
+        _code_hash = code_hash.hexdigest()
+    return _code_hash
+
+
+def compile_value(spec):
+    cell = spec.get('cell', 0)
+    strip_unit = spec.get('strip_unit', False)
+    min_cells = spec.get('min_cells', 0)
+    default = spec.get('default')
+
+    def get_cell(row):
+        if len(row) < min_cells:
+            return default
+        value = row[cell]
+        if strip_unit:
+            value = value.split(' ', 1)[0]
+        return value
+
+    if 'rows' in spec:
+        start, stop = spec['rows']
+
+        def get_value(table):
+            return [get_cell(row) for row in table[start:stop]]
+    else:
+        row = spec['row']
+
+        def get_value(table):
+            return get_cell(table[row])
+
+    return spec['target'], get_value
+
+
+def get_selector(spec):
+    return spec['name'], spec.get('attrs') or {}
+
+
+def compile_block(spec):
+    selectors = [get_selector(selector) for selector in spec['container']]
+    row_name, row_attrs = get_selector(spec['row_selector'])
+    cell_name, cell_attrs = get_selector(spec['cell_selector'])
+    values = [compile_value(value) for value in spec['values']]
+
+    # the table is read once per block, every value only indexes into it
+    def extract_table(table, result, instruments):
+        if instruments:
+            instruments.count('nodes', len(table) + sum(map(len, table)))
+        for target, get_value in values:
+            try:
+                result[target] = get_value(table)
+            except IndexError:
+                logger.exception('Mismatch data for \'%s\': %s', target, table)
+
+    def extract(container, result, instruments=None):
+        for name, attrs in selectors[1:]:
+            container = container.find(name, attrs)
+            if container is None:
+                logger.error('Container %s is missing', selectors)
+                return
+        rows = container.find_all(row_name, row_attrs)
+        extract_table(get_lists_of_values(rows, cell_name, cell_attrs),
+                      result, instruments)
+
+    def open_stream():
+        return BlockStream(selectors, (row_name, row_attrs),
+                           (cell_name, cell_attrs))
+
+    def extract_stream(stream, result, instruments=None):
+        if len(stream.containers) < len(selectors):
+            logger.error('Container %s is missing', selectors)
+            return
+        extract_table(stream.rows, result, instruments)
+
+    return selectors[0], extract, open_stream, extract_stream
+
+
+def compile_page(spec):
+    url = spec['url']
+    params = spec.get('params')
+
+    if spec.get('format') == 'json':
+        target = spec['target']
+        open_stream = None
+        fingerprint = None
+
+        def extract(body, instruments=None, stream=None):
+            try:
+                return {target: json.loads(body.decode('utf-8'))}
+            except ValueError:
+                logger.error('When decode data: url=%s, params=%s',
+                             url, params)
+                return {}
+    else:
+        blocks = [compile_block(block) for block in spec['blocks']]
+        selectors = [block[0] for block in blocks]
+        # a changed spec or extraction code must not match the values
+        # memoized before
+        salt = json.dumps(spec, sort_keys=True) + get_code_hash()
+
+        def fingerprint(body):
+            return get_fingerprint(body, selectors, salt)
+
+        def extract_tree(body, instruments):
+            result = {}
+            containers = extract_blocks(body, selectors)
+            for (selector, extract_block, _, _), container in zip(
+                    blocks, containers):
+                if container is None:
+                    logger.error('Container %s is missing', selector)
+                    continue
+                extract_block(container, result, instruments)
+            return result
+
+        if spec.get('stream'):
+            # the blocks are read while the page downloads, and reading
+            # stops where the last block ends
+            encoding = spec.get('encoding', 'utf-8')
+
+            def open_stream():
+                return PageStream([open_block()
+                                   for _, _, open_block, _ in blocks],
+                                  encoding)
+
+            def extract(body, instruments=None, stream=None):
+                if stream is None or not stream.started:
+                    # e.g. a cached body
+                    stream = open_stream().feed_body(body)
+                if stream.failed:
+                    return extract_tree(body, instruments)
+                result = {}
+                for (_, _, _, extract_stream), block_stream in zip(
+                        blocks, stream.streams):
+                    extract_stream(block_stream, result, instruments)
+                return result
+        else:
+            open_stream = None
+
+            def extract(body, instruments=None, stream=None):
+                return extract_tree(body, instruments)
+
+    def get_url(config):
+        return build_url(url.format(**config), params)
+
+    return get_url, extract, open_stream, fingerprint
+
+
+def compile_graphs(specs, path):
+    # [(target, mapping plan)]
+    return [
+        (spec['value'],
+         get_plan(load_json(os.path.join(path, spec['config'] + '.json')),
+                  spec.get('ratio')))
+        for spec in specs
+    ]
+
+
+def compile_spec(path):
+    spec = load_json(os.path.join(path, SPEC_FILENAME))
+    return ([compile_page(page) for page in spec['pages']],
+            compile_graphs(spec['graphs'], path))
+
+
+def get_spec(path):
+    # specs are compiled once per process and shared by all runs
+    with _specs_lock:
+        if path not in _specs:
+            _specs[path] = compile_spec(path)
+        return _specs[path]
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import time
+
+from core.convert import format_value
+from core.fetch import fetch_pages
+from core.fingerprint import EXTRACT_MEMO
+from core.instrument import Instruments
+from core.instrument import get_timing_values
+from core.instrument import timed
+from core.munin import MuninWriter
+from core.plan import apply_plans
+from core.scrape import get_spec
+
+logger = logging.getLogger('uanpps-station')
+
+
+class Reading(object):
+    # One converted value of a graph field
+    __slots__ = ('graph', 'field', 'value')
+
+    def __init__(self, graph, field, value):
+        self.graph = graph
+        self.field = field
+        self.value = value
+
+    def __repr__(self):
+        return 'Reading({!r}, {!r}, {!r})'.format(self.graph, self.field,
+                                                  self.value)
+
+
+class StationCollector(object):
+    # A run over one station's scrape spec, split into stages:
+    # fetch() -> bodies, parse(bodies) -> readings, to_munin(readings) -> text.
+    # parse() extracts the pages' data, then maps it with the graphs' plans.
+    # Stage durations and counters are kept in `instruments`.
+
+    def __init__(self, name, path, config):
+        self.name = name
+        self.config = config
+        self.pages, self.graphs = get_spec(path)
+        self.instruments = Instruments()
+        self.urls = [None] * len(self.pages)
+        self.streams = [None] * len(self.pages)
+        self.memo = EXTRACT_MEMO
+
+    @timed('fetch')
+    def fetch(self):
+        self.urls = [get_url(self.config) for get_url, _, _, _ in self.pages]
+        # streamed pages are parsed while they download
+        self.streams = [open_stream and open_stream()
+                        for _, _, open_stream, _ in self.pages]
+        return fetch_pages(self.urls, self.config['headers'],
+                           instruments=self.instruments,
+                           consumers=[stream and stream.feed
+                                      for stream in self.streams])
+
+    def extract_page(self, url, page, stream, body):
+        _, extract, _, fingerprint = page
+        if fingerprint is None or self.memo is None:
+            return extract(body, self.instruments, stream)
+        # an unchanged page gives the values it gave last time
+        key = fingerprint(body)
+        entry = self.memo.get(url, key)
+        if entry is not None:
+            self.instruments.count('pages_unchanged')
+            self.instruments.add_time('saved', entry['cost'])
+            return entry['values']
+        started = time.time()
+        values = extract(body, self.instruments, stream)
+        self.instruments.count('pages_parsed')
+        self.memo.put(url, key, values, time.time() - started)
+        return values
+
+    def extract(self, bodies):
+        # target -> data parsed from the pages
+        values = {}
+        for url, page, stream, body in zip(self.urls, self.pages,
+                                           self.streams, bodies):
+            if body is not None:
+                values.update(self.extract_page(url, page, stream, body))
+        return values
+
+    def map_values(self, values):
+        return [Reading(graph, field['id'], value)
+                for graph, entries, converted in apply_plans(self.graphs,
+                                                             values)
+                for (_, field), value in zip(entries, converted)]
+
+    @timed('parse')
+    def parse(self, bodies):
+        return self.map_values(self.extract(bodies))
+
+    @timed('output')
+    def to_munin(self, readings):
+        writer = MuninWriter()
+        graph = None
+        for reading in readings:
+            if reading.graph != graph:
+                graph = reading.graph
+                writer.write('multigraph {}\n'.format(graph))
+            writer.write('{}.value {}\n'.format(reading.field,
+                                                format_value(reading.value)))
+        return writer.getvalue()
+
+    def collect(self):
+        readings = self.parse(self.fetch())
+        logger.info('Scraped %s: %s', self.name,
+                    self.instruments.describe())
+        if not readings:
+            # a failed scrape gives no values, not just its timing graph
+            return ''
+        # the run's own timing graph comes last
+        return self.to_munin(readings) + get_timing_values(
+            '{}_scrape_timing'.format(self.name), self.instruments)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import codecs
+import logging
+
+from HTMLParser import HTMLParseError
+from HTMLParser import HTMLParser
+
+from core.extract import selector_matches
+
+logger = logging.getLogger('uanpps-stream')
+
+# elements without an end tag
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+])
+
+
+class BlockStream(HTMLParser):
+    # Incremental extractor of one scrape block: the first element matching
+    # the container chain, then the rows and cells inside it, as
+    # get_lists_of_values() reads them from a tree. Rows are available in
+    # `rows` as soon as they end; `done` is set once the container ends,
+    # and the rest of the page is never looked at.
+
+    def __init__(self, selectors, row_selector, cell_selector):
+        HTMLParser.__init__(self)
+        self.selectors = selectors
+        self.row_selector = row_selector
+        self.cell_selector = cell_selector
+        self.stack = []
+        # stack depths of the matched containers, the open row and cell
+        self.containers = []
+        self.row = None
+        self.row_depth = None
+        self.cell = None
+        self.cell_depth = None
+        self.rows = []
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        attrs = dict(attrs)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(tag)
+        depth = len(self.stack)
+
+        if len(self.containers) < len(self.selectors):
+            if selector_matches(self.selectors[len(self.containers)], tag,
+                                attrs):
+                self.containers.append(depth)
+        elif self.row is None:
+            if selector_matches(self.row_selector, tag, attrs):
+                self.row = []
+                self.row_depth = depth
+        elif self.cell is None:
+            if selector_matches(self.cell_selector, tag, attrs):
+                self.cell = []
+                self.cell_depth = depth
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.done or tag not in self.stack:
+            return
+        # unclosed elements inside end with their parent
+        while True:
+            depth = len(self.stack)
+            if self.cell is not None and depth == self.cell_depth:
+                text = ''.join(self.cell).strip()
+                if text:
+                    self.row.append(text)
+                self.cell = None
+            if self.row is not None and depth == self.row_depth:
+                self.rows.append(self.row)
+                self.row = None
+            if self.containers and depth == self.containers[-1]:
+                # only the first match of every container is read
+                self.done = True
+            if self.stack.pop() == tag or self.done:
+                return
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+    def handle_entityref(self, name):
+        self.handle_data(self.unescape('&{};'.format(name)))
+
+    def handle_charref(self, name):
+        self.handle_data(self.unescape('&#{};'.format(name)))
+
+
+class PageStream(object):
+    # Feeds the raw chunks of a page to the streams of its blocks. feed()
+    # returns True once every block has ended, i.e. the rest of the body
+    # is not needed.
+
+    def __init__(self, streams, encoding='utf-8'):
+        self.streams = streams
+        self.decoder = codecs.getincrementaldecoder(encoding)('replace')
+        self.started = False
+        self.failed = False
+
+    def feed(self, chunk):
+        self.started = True
+        if self.failed:
+            return False
+        text = self.decoder.decode(chunk)
+        try:
+            for stream in self.streams:
+                if not stream.done:
+                    stream.feed(text)
+        except HTMLParseError:
+            # malformed markup: the page is parsed from its body instead
+            logger.exception('Streaming failed')
+            self.failed = True
+            return False
+        return all(stream.done for stream in self.streams)
+
+    def feed_body(self, body, chunk_size=16 * 1024):
+        for start in range(0, len(body), chunk_size):
+            if self.feed(body[start:start + chunk_size]):
+                break
+        return self
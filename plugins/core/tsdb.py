@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, division
+
+import array
+import bisect
+import io
+import logging
+import math
+import mmap
+import os
+import shutil
+import struct
+import sys
+import time
+
+from core import ROOT_PATH
+from core import ensure_dir
+from core import get_numpy
+
+logger = logging.getLogger('uanpps-tsdb')
+
+TSDB_DIR = os.environ.get('uanpps_tsdb_dir', os.path.join(ROOT_PATH, 'tsdb'))
+TSDB_RETENTION = int(os.environ.get('uanpps_tsdb_retention', 35 * 86400))
+CHUNK_SPAN = 86400
+
+TIME_COLUMN = '_time'
+COLUMN_SUFFIX = '.f64'
+VALUE = struct.Struct(b'<d')
+NAN_VALUE = VALUE.pack(float('nan'))
+
+
+def to_array(data):
+    numpy = get_numpy()
+    if numpy is not None:
+        return numpy.frombuffer(data, dtype='<f8')
+    values = array.array(str('d'))
+    values.fromstring(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class Column(object):
+    # One field of a chunk: little-endian doubles, one per sample
+
+    def __init__(self, path):
+        self.path = path
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.path) // VALUE.size
+        except OSError:
+            return 0
+
+    def resize(self, length):
+        # pad with NaN (or cut) so the column lines up with the time column
+        current = len(self)
+        if current < length:
+            with io.open(self.path, 'ab') as column_file:
+                column_file.write(NAN_VALUE * (length - current))
+        elif current > length:
+            with io.open(self.path, 'r+b') as column_file:
+                column_file.truncate(length * VALUE.size)
+
+    def append(self, value):
+        with io.open(self.path, 'ab') as column_file:
+            column_file.write(VALUE.pack(value))
+
+    def read(self, start, stop):
+        if stop <= start:
+            return to_array(b'')
+        with io.open(self.path, 'rb') as column_file:
+            column_map = mmap.mmap(column_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+            try:
+                return to_array(column_map[start * VALUE.size:
+                                           stop * VALUE.size])
+            finally:
+                column_map.close()
+
+
+class TimeIndex(object):
+    # Sequence view of a memory-mapped time column for bisect
+
+    def __init__(self, column_map):
+        self.column_map = column_map
+
+    def __len__(self):
+        return len(self.column_map) // VALUE.size
+
+    def __getitem__(self, index):
+        return VALUE.unpack_from(self.column_map, index * VALUE.size)[0]
+
+
+class Chunk(object):
+    # All samples of one graph within CHUNK_SPAN seconds, one column file
+    # per field plus the time column. Times are appended in order.
+
+    def __init__(self, path):
+        self.path = path
+        self.start = int(os.path.basename(path))
+
+    def get_column(self, field):
+        return Column(os.path.join(self.path, field + COLUMN_SUFFIX))
+
+    def get_fields(self):
+        return sorted(name[:-len(COLUMN_SUFFIX)]
+                      for name in os.listdir(self.path)
+                      if name.endswith(COLUMN_SUFFIX) and
+                      name != TIME_COLUMN + COLUMN_SUFFIX)
+
+    def append(self, timestamp, values):
+        ensure_dir(self.path)
+        time_column = self.get_column(TIME_COLUMN)
+        length = len(time_column)
+        fields = set(self.get_fields()) | set(values)
+        for field in fields:
+            column = self.get_column(field)
+            column.resize(length)
+            column.append(values.get(field, float('nan')))
+        # the time column is written last and defines the chunk length
+        time_column.append(timestamp)
+
+    def find(self, start, stop):
+        time_column = self.get_column(TIME_COLUMN)
+        if not len(time_column):
+            return 0, 0
+        with io.open(time_column.path, 'rb') as column_file:
+            column_map = mmap.mmap(column_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+            try:
+                index = TimeIndex(column_map)
+                return (bisect.bisect_left(index, start),
+                        bisect.bisect_left(index, stop))
+            finally:
+                column_map.close()
+
+    def read(self, start, stop, fields):
+        first, last = self.find(start, stop)
+        times = self.get_column(TIME_COLUMN).read(first, last)
+        columns = {}
+        for field in fields:
+            column = self.get_column(field)
+            length = len(column)
+            if length >= last:
+                columns[field] = column.read(first, last)
+            else:
+                # interrupted append, the missing tail is unknown
+                columns[field] = concat([
+                    column.read(first, length),
+                    to_array(NAN_VALUE * (last - max(first, length)))])
+        return times, columns
+
+
+class TimeSeriesStore(object):
+    # Columnar store of scraped readings: one directory per graph config id,
+    # one chunk directory per day, one column per field.
+
+    def __init__(self, directory=TSDB_DIR, retention=TSDB_RETENTION):
+        self.directory = directory
+        self.retention = retention
+
+    def get_chunks(self, graph_id, start=None, stop=None):
+        graph_dir = os.path.join(self.directory, graph_id)
+        try:
+            names = os.listdir(graph_dir)
+        except OSError:
+            return []
+        chunks = sorted((Chunk(os.path.join(graph_dir, name))
+                         for name in names if name.isdigit()),
+                        key=lambda chunk: chunk.start)
+        return [chunk for chunk in chunks
+                if (start is None or chunk.start + CHUNK_SPAN > start) and
+                (stop is None or chunk.start < stop)]
+
+    def append(self, graph_id, timestamp, values):
+        chunk_start = int(timestamp // CHUNK_SPAN * CHUNK_SPAN)
+        chunk_path = os.path.join(self.directory, graph_id, str(chunk_start))
+        new_chunk = not os.path.isdir(chunk_path)
+        Chunk(chunk_path).append(timestamp, values)
+        if new_chunk:
+            self.compact(graph_id, timestamp)
+
+    def get_fields(self, graph_id):
+        fields = set()
+        for chunk in self.get_chunks(graph_id):
+            fields.update(chunk.get_fields())
+        return sorted(fields)
+
+    def query(self, graph_id, start, stop, fields=None):
+        if fields is None:
+            fields = self.get_fields(graph_id)
+        times = []
+        columns = dict((field, []) for field in fields)
+        for chunk in self.get_chunks(graph_id, start, stop):
+            chunk_times, chunk_columns = chunk.read(start, stop, fields)
+            times.append(chunk_times)
+            for field in fields:
+                columns[field].append(chunk_columns[field])
+        return concat(times), dict((field, concat(parts))
+                                   for field, parts in columns.items())
+
+    def downsample(self, graph_id, start, stop, step, aggregate='avg',
+                   fields=None):
+        times, columns = self.query(graph_id, start, stop, fields)
+        buckets = [int((timestamp - start) // step) for timestamp in times]
+        return dict((field, aggregate_buckets(buckets, values, aggregate,
+                                              start, step))
+                    for field, values in columns.items())
+
+    def compact(self, graph_id, now=None):
+        now = time.time() if now is None else now
+        cutoff = now - self.retention
+        for chunk in self.get_chunks(graph_id):
+            if chunk.start + CHUNK_SPAN <= cutoff:
+                logger.info('Drop chunk %s', chunk.path)
+                shutil.rmtree(chunk.path, ignore_errors=True)
+
+
+def concat(parts):
+    numpy = get_numpy()
+    if numpy is not None:
+        return numpy.concatenate(parts) if parts else numpy.empty(0)
+    values = array.array(str('d'))
+    for part in parts:
+        values.extend(part)
+    return values
+
+
+AGGREGATES = {
+    'avg': lambda values: sum(values) / len(values),
+    'sum': sum,
+    'min': min,
+    'max': max,
+    'spread': lambda values: max(values) - min(values),
+}
+
+
+def aggregate_buckets(buckets, values, aggregate, start, step):
+    # [(bucket start time, aggregated value)] for buckets with data
+    grouped = {}
+    for bucket, value in zip(buckets, values):
+        if not math.isnan(value):
+            grouped.setdefault(bucket, []).append(value)
+    return [(start + bucket * step, AGGREGATES[aggregate](grouped[bucket]))
+            for bucket in sorted(grouped)]
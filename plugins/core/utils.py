@@ -1,36 +1,71 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, print_function
 
-import httplib
+import io
 import json
 import logging
-import requests
+import os
+import random
+import sys
+import tempfile
+import threading
 
-from fake_useragent import FakeUserAgentError
-from fake_useragent import UserAgent
+from core import ROOT_PATH
+from core import ensure_dir
+from core.convert import format_value
+from core.plan import convert_mapped
+from core.plan import get_plan
+
+# requests is only imported on the fetch path, so that `config` and
+# `autoconf` runs stay cheap
 
 logger = logging.getLogger('uanpps-core')
 
+POOL_SIZE = int(os.environ.get('uanpps_pool_size', 4))
+CONNECT_TIMEOUT = float(os.environ.get('uanpps_connect_timeout', 5))
+READ_TIMEOUT = float(os.environ.get('uanpps_read_timeout', 25))
+
+USER_AGENTS_PATH = os.path.join(os.path.dirname(__file__), '..', 'data',
+                                'user_agents.json')
+USER_AGENTS_CACHE = os.environ.get(
+    'uanpps_user_agents_cache',
+    os.path.join(ROOT_PATH, 'cache', 'user_agents.txt'))
+# an extra list of User-Agents, e.g. the fake-useragent database
+USER_AGENTS_EXTRA = os.environ.get('uanpps_user_agents', '')
+DEFAULT_USER_AGENT = ('Mozilla/5.0 (Windows NT 6.1; WOW64; rv:41.0) '
+                      'Gecko/20100101 Firefox/41.0')
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
 
 def load_json(full_path):
     with open(full_path) as json_file:
         return json.load(json_file)
 
 
-def init_multigraph(config):
-    print('multigraph {}'.format(config['id']))
-    print('graph_title {}'.format(config['title']))
-    print('graph_category {}'.format(config['category']))
-    print('graph_vlabel {}'.format(config['vlabel']))
+def get_env(name, default, prefix=''):
+    return os.environ.get(prefix + name, default)
+
+
+def init_multigraph(config, out=None):
+    out = sys.stdout if out is None else out
+    lines = [
+        'multigraph {}\n'.format(config['id']),
+        'graph_title {}\n'.format(config['title']),
+        'graph_category {}\n'.format(config['category']),
+        'graph_vlabel {}\n'.format(config['vlabel'])
+    ]
     if config['total']:
-        print('graph_total {}'.format(config['total']))
-    print('graph_scale {}'.format(config['scale']))
+        lines.append('graph_total {}\n'.format(config['total']))
+    lines.append('graph_scale {}\n'.format(config['scale']))
+    out.write(''.join(lines))
 
 
-def get_lists_of_values(html_table_rows):
+def get_lists_of_values(html_table_rows, cell_name='td', cell_attrs=None):
     values_list = []
     for row in html_table_rows:
-        cols = row.find_all('td')
+        cols = row.find_all(cell_name, cell_attrs or {})
         cols = [elem.text.strip() for elem in cols]
         values_list.append([elem for elem in cols if elem])
     return values_list
@@ -45,69 +80,179 @@ def get_color_value(colors, name):
     return value
 
 
-def init_base_parameters(config, colors):
+def init_base_parameters(config, colors, out=None):
+    out = sys.stdout if out is None else out
     for field in config['fields']:
         try:
-            print('{}.label {}'.format(field['id'], field['label']))
+            out.write('{}.label {}\n'.format(field['id'], field['label']))
         except UnicodeEncodeError:
             logger.exception('Encoding error for field %s', field['id'])
             continue
         if 'colour' in field:
-            print('{}.colour {}'.format(
-                field['id'],
-                get_color_value(colors, field['colour']))
-            )
+            out.write('{}.colour {}\n'.format(
+                field['id'], get_color_value(colors, field['colour'])))
         if 'info' in field:
-            print('{}.info {}'.format(field['id'], field['info']))
+            out.write('{}.info {}\n'.format(field['id'], field['info']))
 
 
-def get_values_multigraph(data, config, ratio=None):
-    print('multigraph {}'.format(config['id']))
-    for i, field in enumerate(config['fields']):
-        if 'parameter' in field.keys():
-            if '.' in field['parameter']:
-                parameter = field['parameter'].split('.')
-                value = data[parameter[0]][parameter[1]]
-            else:
-                parameter = field['parameter']
-                try:
-                    value = data[parameter]
-                except KeyError:
-                    logger.exception('Parameter \'%s\' is missing', parameter)
-                    break
-        else:
-            try:
-                value = data[i] if isinstance(data, list) else data
-            except IndexError:
-                logger.exception('Mismatch data for field \'%s\': %s',
-                                 field['id'], data)
-                break
+def print_autoconf(modules=('bs4', 'requests')):
+    # look the scraping dependencies up without importing them
+    import imp
+
+    missing = []
+    for module in modules:
         try:
-            if isinstance(value, (str, unicode)):
-                value = value.replace(',', '.')
-            value = float(value)
-        except (TypeError, ValueError):
-            logger.exception('Invalid value for field \'%s\': %s',
-                             field['id'], value)
-            continue
-        if ratio:
-            value = float(value) * ratio
-        print('{}.value {:.2f}'.format(field['id'], value))
+            imp.find_module(module)
+        except ImportError:
+            missing.append(module)
+    if missing:
+        print('no (missing {})'.format(', '.join(missing)))
+    else:
+        print('yes')
+
+
+def get_field_values(data, config, ratio=None):
+    # [(value prefix, field, value)] for the fields with a valid value
+    plan = get_plan(config, ratio)
+    entries, values = plan.apply(data)
+    _, entries, values = convert_mapped([(plan, entries, values)])[0]
+    return [(prefix, field, value)
+            for (prefix, field), value in zip(entries, values)]
+
+
+def get_values_multigraph(data, config, ratio=None, out=None):
+    out = sys.stdout if out is None else out
+    lines = ['multigraph {}\n'.format(config['id'])]
+    for prefix, _, value in get_field_values(data, config, ratio):
+        lines.append('{}{}\n'.format(prefix, format_value(value)))
+    out.write(''.join(lines))
+
+
+def get_session(pool_size=POOL_SIZE):
+    # one session per process keeps connections to every host alive
+    # between requests, stations and collector runs
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _sessions_lock:
+        session = _sessions.get(pool_size)
+        if session is None:
+            if os.environ.get('uanpps_replay_dir'):
+                # recorded pages instead of the network
+                from core.replay import ReplayAdapter
+                adapter = ReplayAdapter()
+            else:
+                adapter = HTTPAdapter(pool_connections=pool_size,
+                                      pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[pool_size] = session
+    return session
+
+
+def get_timeout():
+    return CONNECT_TIMEOUT, READ_TIMEOUT
 
 
 def enable_requests_logging():
+    import httplib
+    import requests
+
     httplib.HTTPConnection.debuglevel = 1
     requests_log = logging.getLogger('requests.packages.urllib3')
     requests_log.setLevel(logging.DEBUG)
     requests.propagate = True
 
 
+def is_valid_user_agent(agent):
+    # the strings become request headers: control characters (CR, LF)
+    # would inject headers of their own
+    return isinstance(agent, basestring) and bool(agent.strip()) and \
+        not any(ord(char) < 32 or ord(char) == 127 for char in agent)
+
+
+class UserAgentProvider(object):
+    # Rotates through a local list of User-Agent strings, never touching the
+    # network. The list is built from data/user_agents.json and the list set
+    # by `uanpps_user_agents` (a JSON list or a fake-useragent database),
+    # and kept as a plain text file.
+
+    def __init__(self, sources=None, cache_path=USER_AGENTS_CACHE):
+        if sources is None:
+            sources = [USER_AGENTS_PATH]
+            if USER_AGENTS_EXTRA:
+                sources.append(USER_AGENTS_EXTRA)
+        self.sources = list(sources)
+        self.cache_path = cache_path
+        self.user_agents = None
+        self.position = 0
+        self.lock = threading.Lock()
+
+    def is_cache_valid(self, sources):
+        try:
+            cache_mtime = os.path.getmtime(self.cache_path)
+        except OSError:
+            return False
+        return all(os.path.getmtime(path) <= cache_mtime for path in sources)
+
+    def build(self, sources):
+        user_agents = []
+        for path in sources:
+            data = load_json(path)
+            if isinstance(data, dict):
+                # fake-useragent database
+                for browser_agents in data.get('browsers', {}).values():
+                    user_agents.extend(browser_agents)
+            else:
+                user_agents.extend(data)
+        unique_agents = []
+        for agent in user_agents:
+            if is_valid_user_agent(agent) and agent not in unique_agents:
+                unique_agents.append(agent)
+        return unique_agents
+
+    def store(self, user_agents):
+        ensure_dir(os.path.dirname(self.cache_path))
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.cache_path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as cache_file:
+            cache_file.write('\n'.join(user_agents).encode('utf-8'))
+        os.rename(tmp_path, self.cache_path)
+
+    def load(self):
+        try:
+            if self.is_cache_valid(self.sources):
+                with io.open(self.cache_path, encoding='utf-8') as cache_file:
+                    user_agents = [agent
+                                   for agent in cache_file.read().splitlines()
+                                   if is_valid_user_agent(agent)]
+                return user_agents or [DEFAULT_USER_AGENT]
+            user_agents = self.build(self.sources)
+        except (IOError, OSError, ValueError):
+            logger.exception('Failed to load User-Agent list')
+            return [DEFAULT_USER_AGENT]
+        try:
+            self.store(user_agents)
+        except (IOError, OSError):
+            # the list is built again by the next run
+            logger.exception('Failed to store User-Agent list')
+        return user_agents or [DEFAULT_USER_AGENT]
+
+    def next(self):
+        with self.lock:
+            if self.user_agents is None:
+                self.user_agents = self.load()
+                self.position = random.randrange(len(self.user_agents))
+            user_agent = self.user_agents[self.position]
+            self.position = (self.position + 1) % len(self.user_agents)
+        return user_agent
+
+
+USER_AGENTS = UserAgentProvider()
+
+
 def get_random_user_agent():
-    try:
-        user_agent = UserAgent()
-        user_agent = user_agent.random
-    except FakeUserAgentError:
-        user_agent = ('Mozilla/5.0 (Windows NT 6.1; WOW64; rv:41.0) '
-                      'Gecko/20100101 Firefox/41.0')
+    user_agent = USER_AGENTS.next()
     logger.debug('UserAgent = "%s"', user_agent)
     return user_agent
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#%# family=auto
+#%# capabilities=autoconf
+from __future__ import unicode_literals, print_function
+
+import ast
+import logging
+import os
+import sys
+import time
+
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+
+from core import setup_logging
+from core.config_cache import print_config
+from core.samples import parse_values
+from core.tsdb import AGGREGATES
+from core.utils import enable_requests_logging
+from core.utils import get_env
+from core.utils import get_random_user_agent
+from core.utils import init_base_parameters
+from core.utils import init_multigraph
+from core.utils import load_json
+from core.utils import print_autoconf
+
+logger = logging.getLogger('fleet-node')
+
+PLUGIN_PATH = os.path.realpath(__file__)
+ROOT_PATH = os.path.dirname(PLUGIN_PATH)
+ABSOLUTE_PATH = ROOT_PATH + '/data/fleet/'
+
+COLORS_PATH = ROOT_PATH + '/data/colors.json'
+
+GRAPHS = ('loads_units', 'radiology', 'air_temperature')
+
+# seconds to wait for a station, e.g. `znpp_timeout` for one station
+TIMEOUT = int(os.environ.get('uanpps_fleet_timeout', 30))
+
+
+def load_graphs():
+    return [load_json(ABSOLUTE_PATH + '{}.json'.format(graph))
+            for graph in GRAPHS]
+
+
+def display_config(out=None):
+    colors = load_json(COLORS_PATH)
+    loads_units, radiology, air_temperature = load_graphs()
+
+    # Loads Units of all stations
+    init_multigraph(loads_units, out)
+    print('graph_args --base 1000 --lower-limit 0', file=out)
+    init_base_parameters(loads_units, colors, out)
+    for field in loads_units['fields']:
+        print('{}.draw AREASTACK'.format(field['id']), file=out)
+        print('{}.min 0'.format(field['id']), file=out)
+    print('', file=out)
+
+    # Highest radiation level of each station
+    init_multigraph(radiology, out)
+    print('graph_args --base 1000 --lower-limit 0 --alt-y-grid', file=out)
+    init_base_parameters(radiology, colors, out)
+    print('', file=out)
+
+    # Air temperature spread between the stations
+    init_multigraph(air_temperature, out)
+    print(('graph_args --base 1000 --upper-limit 20 --lower-limit -20 '
+           'HRULE:0#a1a1a1'), file=out)
+    init_base_parameters(air_temperature, colors, out)
+    print('', file=out)
+
+
+def collect(stations, user_agent):
+    # All stations are scraped at once; a station that does not answer in
+    # its timeout is left out instead of holding back the others.
+    pool = ThreadPool(len(stations))
+    started = time.time()
+    try:
+        results = [
+            (name, pool.apply_async(node, (get_config(user_agent,
+                                                      name + '_'),)))
+            for name, node, get_config in stations
+        ]
+        readings = {}
+        for name, result in results:
+            timeout = int(get_env('timeout', TIMEOUT, name + '_'))
+            try:
+                values = result.get(max(started + timeout - time.time(), 0))
+            except TimeoutError:
+                logger.error('Timed out collecting %s after %d s', name,
+                             timeout)
+                continue
+            except Exception:
+                logger.exception('Failed to collect %s', name)
+                continue
+            readings.update(parse_values(values))
+        return readings
+    finally:
+        # do not wait for the stations that timed out
+        pool.terminate()
+
+
+def get_fleet_values(graphs, readings):
+    lines = []
+    for graph in graphs:
+        lines.append('multigraph {}\n'.format(graph['id']))
+        for field in graph['fields']:
+            values = [value for source in field['sources']
+                      for value in readings.get(source, {}).values()]
+            if values:
+                value = AGGREGATES[field['aggregate']](values)
+                lines.append('{}.value {:.2f}\n'.format(field['id'], value))
+            else:
+                lines.append('{}.value U\n'.format(field['id']))
+    return ''.join(lines)
+
+
+def fleet_node(stations, user_agent):
+    logger.info('Start fleet-node (main)')
+
+    values = get_fleet_values(load_graphs(), collect(stations, user_agent))
+
+    logger.info('Finish fleet-node (main)')
+    return values
+
+
+def main():
+    # display config
+    if len(sys.argv) > 1 and sys.argv[1] == 'config':
+        print_config('fleet', [ABSOLUTE_PATH, COLORS_PATH, PLUGIN_PATH],
+                     display_config)
+        sys.exit(0)
+
+    # check whether the plugin can run
+    if len(sys.argv) > 1 and sys.argv[1] == 'autoconf':
+        print_autoconf()
+        sys.exit(0)
+
+    setup_logging()
+
+    # turn on requests logging
+    if ast.literal_eval(os.environ.get('uanpps_logging', 'False')):
+        enable_requests_logging()
+
+    # the station plugins are only loaded to scrape; their settings use the
+    # station prefix, as in the collector
+    from uanpps_collector import STATIONS
+
+    sys.stdout.write(fleet_node(STATIONS, get_random_user_agent()))
+    sys.exit(0)
+
+if __name__ == '__main__':
+    main()
@@ -1,157 +1,158 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+#
+#%# family=auto
+#%# capabilities=autoconf
 from __future__ import unicode_literals, print_function
 
 import ast
-import json
 import logging
 import os
-import requests
 import sys
 
+from core import setup_logging
+from core.config_cache import print_config
+from core.results import get_memoized_result
+from core.results import print_result
 from core.utils import enable_requests_logging
+from core.utils import get_env
 from core.utils import get_random_user_agent
-from core.utils import get_values_multigraph
 from core.utils import init_base_parameters
 from core.utils import init_multigraph
 from core.utils import load_json
+from core.utils import print_autoconf
 
 logger = logging.getLogger('rnpp-node')
 
-ROOT_PATH = os.path.dirname(os.path.realpath(__file__))
+PLUGIN_PATH = os.path.realpath(__file__)
+ROOT_PATH = os.path.dirname(PLUGIN_PATH)
 ABSOLUTE_PATH = ROOT_PATH + '/data/rnpp/'
 
-AIR_TEMPERATURE = load_json(ABSOLUTE_PATH + 'air_temperature.json')
-HUMIDITY = load_json(ABSOLUTE_PATH + 'humidity.json')
-ATM = load_json(ABSOLUTE_PATH + 'atm.json')
-RAINFALL_INTENSITY = load_json(ABSOLUTE_PATH + 'rainfall_intensity.json')
-WIND_SPEED = load_json(ABSOLUTE_PATH + 'wind_speed.json')
-RADIOLOGY = load_json(ABSOLUTE_PATH + 'radiology.json')
-PRODUCTION_ELECTRICITY = load_json(ABSOLUTE_PATH + 'production_electricity.json')
-COLORS = load_json(ROOT_PATH + '/data/colors.json')
+COLORS_PATH = ROOT_PATH + '/data/colors.json'
 
 
-def display_config():
+def display_config(out=None):
+    colors = load_json(COLORS_PATH)
+    air_temperature = load_json(ABSOLUTE_PATH + 'air_temperature.json')
+    humidity = load_json(ABSOLUTE_PATH + 'humidity.json')
+    atm = load_json(ABSOLUTE_PATH + 'atm.json')
+    rainfall_intensity = load_json(ABSOLUTE_PATH + 'rainfall_intensity.json')
+    wind_speed = load_json(ABSOLUTE_PATH + 'wind_speed.json')
+    radiology = load_json(ABSOLUTE_PATH + 'radiology.json')
+    production_electricity = load_json(
+        ABSOLUTE_PATH + 'production_electricity.json')
+    scrape_timing = load_json(ABSOLUTE_PATH + 'scrape_timing.json')
+
     # Air temperature
-    init_multigraph(AIR_TEMPERATURE)
+    init_multigraph(air_temperature, out)
     print(('graph_args --base 1000 --upper-limit 20 --lower-limit -20 '
-           'HRULE:0#a1a1a1'))
-    init_base_parameters(AIR_TEMPERATURE, COLORS)
-    print('')
+           'HRULE:0#a1a1a1'), file=out)
+    init_base_parameters(air_temperature, colors, out)
+    print('', file=out)
 
     # Relative humidity
-    init_multigraph(HUMIDITY)
-    print('graph_args --base 1000 --upper-limit 100 --lower-limit 0')
-    init_base_parameters(HUMIDITY, COLORS)
-    print('')
+    init_multigraph(humidity, out)
+    print('graph_args --base 1000 --upper-limit 100 --lower-limit 0', file=out)
+    init_base_parameters(humidity, colors, out)
+    print('', file=out)
 
     # Atmospheric pressure
-    init_multigraph(ATM)
-    print('graph_args --base 1000')
-    init_base_parameters(ATM, COLORS)
-    for field in ATM['fields']:
-        print('{}.draw AREA'.format(field['id']))
-    print('')
+    init_multigraph(atm, out)
+    print('graph_args --base 1000', file=out)
+    init_base_parameters(atm, colors, out)
+    for field in atm['fields']:
+        print('{}.draw AREA'.format(field['id']), file=out)
+    print('', file=out)
 
     # Intensity of rainfall
-    init_multigraph(RAINFALL_INTENSITY)
-    print('graph_args --base 1000 --upper-limit 5 --lower-limit 0')
-    init_base_parameters(RAINFALL_INTENSITY, COLORS)
-    for field in RAINFALL_INTENSITY['fields']:
-        print('{}.draw AREA'.format(field['id']))
-    print('')
+    init_multigraph(rainfall_intensity, out)
+    print('graph_args --base 1000 --upper-limit 5 --lower-limit 0', file=out)
+    init_base_parameters(rainfall_intensity, colors, out)
+    for field in rainfall_intensity['fields']:
+        print('{}.draw AREA'.format(field['id']), file=out)
+    print('', file=out)
 
     # Wind speed
-    init_multigraph(WIND_SPEED)
-    print('graph_args --base 1000 --upper-limit 20 --lower-limit 0')
-    init_base_parameters(WIND_SPEED, COLORS)
-    for field in WIND_SPEED['fields']:
-        print('{}.draw LINE{}'.format(field['id'], field['thickness']))
-    print('')
+    init_multigraph(wind_speed, out)
+    print('graph_args --base 1000 --upper-limit 20 --lower-limit 0', file=out)
+    init_base_parameters(wind_speed, colors, out)
+    for field in wind_speed['fields']:
+        print('{}.draw LINE{}'.format(field['id'], field['thickness']),
+              file=out)
+    print('', file=out)
 
     # Radiological situation
-    init_multigraph(RADIOLOGY)
-    print('graph_args --base 1000 --lower-limit 0 --alt-y-grid')
-    init_base_parameters(RADIOLOGY, COLORS)
-    print('')
+    init_multigraph(radiology, out)
+    print('graph_args --base 1000 --lower-limit 0 --alt-y-grid', file=out)
+    init_base_parameters(radiology, colors, out)
+    print('', file=out)
 
     # Production of electricity for current day/month
-    init_multigraph(PRODUCTION_ELECTRICITY)
-    print('graph_args --base 1000 --lower-limit 0')
-    init_base_parameters(PRODUCTION_ELECTRICITY, COLORS)
-    for field in PRODUCTION_ELECTRICITY['fields']:
-        print('{}.draw AREA'.format(field['id']))
-    print('')
-
-
-def rnpp_node(config):
-    logger.info('Start rnpp-node (main)')
+    init_multigraph(production_electricity, out)
+    print('graph_args --base 1000 --lower-limit 0', file=out)
+    init_base_parameters(production_electricity, colors, out)
+    for field in production_electricity['fields']:
+        print('{}.draw AREA'.format(field['id']), file=out)
+    print('', file=out)
 
-    url = 'http://{}/informer/sprut.php'.format(config['host'])
+    # Duration of the scrape stages
+    init_multigraph(scrape_timing, out)
+    print('graph_args --base 1000 --lower-limit 0', file=out)
+    init_base_parameters(scrape_timing, colors, out)
+    print('', file=out)
 
-    response = requests.get(url=url, params=config['params1'],
-                            headers=config['headers'])
-    response.encoding = 'utf-8'
-    data = json.loads(response.text)
 
-    # Air temperature
-    get_values_multigraph(data, AIR_TEMPERATURE)
+def get_collector(config):
+    # bs4 and requests are only needed to scrape
+    from core.station import StationCollector
 
-    # Relative humidity
-    get_values_multigraph(data, HUMIDITY)
+    return StationCollector('rnpp', ABSOLUTE_PATH, config)
 
-    # Atmospheric pressure (convert hectopascals to millimeter of mercury)
-    get_values_multigraph(data, ATM, 0.7500637554192)
 
-    # Intensity of rainfall
-    get_values_multigraph(data, RAINFALL_INTENSITY)
-
-    # Wind speed
-    get_values_multigraph(data, WIND_SPEED)
-
-    # Radiological situation
-    get_values_multigraph(data, RADIOLOGY)
-
-    response = requests.get(url=url, params=config['params3'],
-                            headers=config['headers'])
-    response.encoding = 'utf-8'
-    try:
-        data = json.loads(response.text)
-    except ValueError:
-        logger.error('When decode data: url=%s, params=%s',
-                     url, config['params3'])
+def rnpp_node(config):
+    logger.info('Start rnpp-node (main)')
+    values = get_collector(config).collect()
+    logger.info('Finish rnpp-node (main)')
+    return values
 
-    # Production of electricity for current month
-    get_values_multigraph(data, PRODUCTION_ELECTRICITY, 0.001)
 
-    logger.info('Finish rnpp-node (main)')
-    sys.exit(0)
+def get_config(user_agent, prefix=''):
+    return {
+        'host': get_env('host', 'www.rnpp.rv.ua', prefix),
+        'logging': os.environ.get('uanpps_logging', 'False'),
+        'headers': {'User-Agent': user_agent}
+    }
 
 
 def main():
     # display config
     if len(sys.argv) > 1 and sys.argv[1] == 'config':
-        display_config()
+        print_config('rnpp', [ABSOLUTE_PATH, COLORS_PATH, PLUGIN_PATH],
+                     display_config)
+        sys.exit(0)
+
+    # check whether the plugin can run
+    if len(sys.argv) > 1 and sys.argv[1] == 'autoconf':
+        print_autoconf()
+        sys.exit(0)
+
+    # print values prepared by the collector
+    if print_result('rnpp'):
         sys.exit(0)
 
-    # init User-Agent
-    user_agent = get_random_user_agent()
+    setup_logging()
 
     # init config
-    config = {
-        'host': os.environ.get('host', 'www.rnpp.rv.ua'),
-        'logging': os.environ.get('uanpps_logging', 'False'),
-        'params1': {'value': 'sprutbase'},
-        'params2': {'value': 'rnpp_n'},
-        'params3': {'value': 'rnpp_current_state_sm'},
-        'headers': {'User-Agent': user_agent}
-    }
+    config = get_config(get_random_user_agent())
 
     # turn on requests logging
     if ast.literal_eval(config['logging']):
         enable_requests_logging()
 
-    rnpp_node(config)
+    # overlapping runs share one scrape
+    values = get_memoized_result('rnpp', lambda: rnpp_node(config))
+    sys.stdout.write(values)
+    sys.exit(0)
 
 if __name__ == '__main__':
     main()
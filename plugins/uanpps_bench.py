@@ -0,0 +1,671 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, print_function
+
+import argparse
+import atexit
+import httplib
+import io
+import math
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from core import ROOT_PATH
+from core import ensure_dir
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+FIXTURES_DIR = os.environ.get('uanpps_fixtures_dir',
+                              os.path.join(ROOT_PATH, 'tests', 'fixtures'))
+PLUGINS_PATH = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(PLUGINS_PATH, 'data')
+STATION_NAMES = ('khnpp', 'znpp', 'rnpp', 'sunpp')
+# the graphs with the most fields
+OUTPUT_GRAPHS = ('znpp/radiology_30km.json', 'khnpp/radiology.json')
+# seconds between the samples of the time-series store benchmark
+SAMPLE_STEP = 60
+# the stub pages of the fetch backends benchmark
+PAGE_SIZE = 50 * 1024
+PAGE_DELAY = 0.02
+
+# `record` scrapes every station once from the sites and keeps the pages and
+# the output as fixtures; `run` replays them through each station's whole
+# pipeline and compares the output with the recorded (golden) one; `map`
+# does the same for the mapping of the parsed data to the graph fields only.
+# `parse` times the extraction of the recorded HTML pages alone, by the
+# three ways of parsing them.
+# `output` times the munin output of the largest graphs, written line by
+# line with print() and through a MuninWriter, without any station; `tsdb`
+# times the time-series store, filled with generated samples; `backends`
+# times the fetch backends against local stubs of the stations; `exporter`
+# loads the exporter serving the recorded results.
+
+
+def get_golden_path(directory, name):
+    return os.path.join(directory, '{}.golden'.format(name))
+
+
+def get_percentile(durations, percent):
+    ordered = sorted(durations)
+    index = int(math.ceil(percent / 100.0 * len(ordered))) - 1
+    return ordered[max(index, 0)]
+
+
+def scrape(station, config):
+    collector = station.get_collector(config)
+    # without the timing graph, which differs on every run
+    return collector.to_munin(collector.parse(collector.fetch()))
+
+
+def record(stations, user_agent, directory):
+    for name, station in stations:
+        values = scrape(station, station.get_config(user_agent, name + '_'))
+        with io.open(get_golden_path(directory, name), 'w',
+                     encoding='utf-8') as golden_file:
+            golden_file.write(values)
+        print('{:<8} {} lines recorded'.format(name, len(values.splitlines())))
+    return True
+
+
+def get_max_rss():
+    # bytes; ru_maxrss is in KiB on Linux and in bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def get_peak_rss(function, *args):
+    # the growth of the maximum resident set over one call, in a forked
+    # process whose maximum starts at the resident set it inherits
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            before = get_max_rss()
+            function(*args)
+            os.write(write_fd, str(get_max_rss() - before).encode('ascii'))
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as peak_file:
+        peak = peak_file.read()
+    os.waitpid(pid, 0)
+    return int(peak) if peak else None
+
+
+def get_peak_memory(function, *args):
+    # bytes at the peak of one call
+    if tracemalloc is None:
+        return get_peak_rss(function, *args)
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def format_memory(peak):
+    return 'n/a' if peak is None else '{:.0f}'.format(peak / 1024.0)
+
+
+def compare_golden(directory, name, values):
+    try:
+        with io.open(get_golden_path(directory, name),
+                     encoding='utf-8') as golden_file:
+            return 'ok' if golden_file.read() == values else 'DIFF'
+    except IOError:
+        return 'no golden'
+
+
+def run(stations, user_agent, directory, runs):
+    print('{:<8} {:>6} {:>10} {:>10} {:>10}  {}'.format(
+        'station', 'runs', 'p50 ms', 'p99 ms', 'peak KiB', 'output'))
+    passed = True
+    for name, station in stations:
+        config = station.get_config(user_agent, name + '_')
+        durations = []
+        values = None
+        for _ in range(runs):
+            started = time.time()
+            values = scrape(station, config)
+            durations.append(time.time() - started)
+        peak = get_peak_memory(scrape, station, config)
+
+        output = compare_golden(directory, name, values)
+        passed = passed and output == 'ok'
+
+        print('{:<8} {:>6} {:>10.2f} {:>10.2f} {:>10}  {}'.format(
+            name, runs, get_percentile(durations, 50) * 1000,
+            get_percentile(durations, 99) * 1000, format_memory(peak), output))
+    return passed
+
+
+def map_values(stations, user_agent, directory, runs):
+    # the pages are fetched and parsed once, the mapping is timed alone
+    print('{:<8} {:>6} {:>10} {:>10} {:>10}  {}'.format(
+        'station', 'runs', 'p50 us', 'p99 us', 'fields', 'output'))
+    passed = True
+    for name, station in stations:
+        collector = station.get_collector(
+            station.get_config(user_agent, name + '_'))
+        values = collector.extract(collector.fetch())
+        durations = []
+        readings = []
+        for _ in range(runs):
+            started = time.time()
+            readings = collector.map_values(values)
+            durations.append(time.time() - started)
+
+        output = compare_golden(directory, name,
+                                collector.to_munin(readings))
+        passed = passed and output == 'ok'
+        print('{:<8} {:>6} {:>10.1f} {:>10.1f} {:>10}  {}'.format(
+            name, runs, get_percentile(durations, 50) * 1e6,
+            get_percentile(durations, 99) * 1e6, len(readings), output))
+    return passed
+
+
+def parse_tree(blocks, body):
+    # the whole page as one tree, as the plugins parsed it before the
+    # extraction engine
+    from bs4 import BeautifulSoup
+    from core.extract import HTML_PARSER
+
+    soup = BeautifulSoup(body, HTML_PARSER)
+    result = {}
+    for (name, attrs), extract, _, _ in blocks:
+        container = soup.find(name, attrs)
+        if container is not None:
+            extract(container, result)
+    return result
+
+
+def parse_strainer(blocks, body):
+    from core.extract import extract_blocks
+
+    result = {}
+    containers = extract_blocks(body, [selector for selector, _, _, _
+                                       in blocks])
+    for (_, extract, _, _), container in zip(blocks, containers):
+        if container is not None:
+            extract(container, result)
+    return result
+
+
+def parse_stream(blocks, body, encoding='utf-8'):
+    from core.stream import PageStream
+
+    stream = PageStream([open_stream() for _, _, open_stream, _ in blocks],
+                        encoding).feed_body(body)
+    result = {}
+    for (_, _, _, extract_stream), block_stream in zip(blocks,
+                                                       stream.streams):
+        extract_stream(block_stream, result)
+    return result
+
+
+def load_pages(name, config, directory):
+    # [(blocks, body, encoding)] of the station's recorded HTML pages
+    from core.fetch import build_url
+    from core.replay import load_fixture
+    from core.scrape import SPEC_FILENAME
+    from core.scrape import compile_block
+    from core.utils import load_json
+
+    pages = []
+    spec = load_json(os.path.join(DATA_PATH, name, SPEC_FILENAME))
+    for page in spec['pages']:
+        if page.get('format') == 'json':
+            continue
+        url = build_url(page['url'].format(**config), page.get('params'))
+        fixture = load_fixture(directory, url)
+        if fixture is None:
+            raise IOError('No recorded page for {}'.format(url))
+        pages.append(([compile_block(block) for block in page['blocks']],
+                      fixture[1], page.get('encoding', 'utf-8')))
+    return pages
+
+
+def parse_pages(parse, pages):
+    result = {}
+    for blocks, body, encoding in pages:
+        if parse is parse_stream:
+            result.update(parse(blocks, body, encoding))
+        else:
+            result.update(parse(blocks, body))
+    return result
+
+
+def parse(stations, user_agent, directory, runs):
+    # the HTML pages of every station parsed as a whole tree, as a tree of
+    # the containers only (SoupStrainer) and as a stream; the three must
+    # give the same values
+    methods = (parse_tree, parse_strainer, parse_stream)
+    print('{:<8} {:>6} {:>25} {:>25}  {}'.format(
+        'station', 'runs', 'p50 ms tree/strain/strm',
+        'peak KiB tree/strain/strm', 'output'))
+    passed = True
+    for name, station in stations:
+        pages = load_pages(name, station.get_config(user_agent, name + '_'),
+                           directory)
+        if not pages:
+            print('{:<8} {:>6} {:>25} {:>25}  {}'.format(
+                name, runs, '-', '-', 'no HTML pages'))
+            continue
+        times = []
+        peaks = []
+        results = []
+        for method in methods:
+            durations = []
+            for _ in range(runs):
+                started = time.time()
+                result = parse_pages(method, pages)
+                durations.append(time.time() - started)
+            times.append(get_percentile(durations, 50) * 1000)
+            peaks.append(get_peak_memory(parse_pages, method, pages))
+            results.append(result)
+        same = all(result == results[0] for result in results)
+        passed = passed and same and bool(results[0])
+        print('{:<8} {:>6} {:>25} {:>25}  {}'.format(
+            name, runs, '/'.join('{:.2f}'.format(value) for value in times),
+            '/'.join(format_memory(peak) for peak in peaks),
+            'ok' if same else 'DIFF'))
+    return passed
+
+
+def append_samples(store, graph_id, fields, start, count):
+    for index in range(count):
+        store.append(graph_id, start + index * SAMPLE_STEP,
+                     dict((field, index + position)
+                          for position, field in enumerate(fields)))
+
+
+def tsdb(days, runs):
+    # `days` of 1-minute samples of the graph with the most fields, appended
+    # one by one to an empty store, then scanned over ranges of growing span
+    # and one field downsampled to hours
+    from core import get_numpy
+    from core.tsdb import CHUNK_SPAN
+    from core.tsdb import TimeSeriesStore
+    from core.utils import load_json
+
+    config = load_json(os.path.join(DATA_PATH, OUTPUT_GRAPHS[0]))
+    fields = [field['id'] for field in config['fields']]
+    count = days * CHUNK_SPAN // SAMPLE_STEP
+    stop = int(time.time()) // CHUNK_SPAN * CHUNK_SPAN
+    start = stop - count * SAMPLE_STEP
+    directory = tempfile.mkdtemp(prefix='uanpps-tsdb-')
+    try:
+        store = TimeSeriesStore(directory, retention=(days + 1) * CHUNK_SPAN)
+        started = time.time()
+        append_samples(store, config['id'], fields, start, count)
+        elapsed = time.time() - started
+        print('{} samples of {} fields appended in {:.1f} s, {:.0f}/s '
+              '({})'.format(count, len(fields), elapsed, count / elapsed,
+                            'numpy' if get_numpy() else 'array'))
+
+        print('{:<12} {:>6} {:>10} {:>10} {:>10}  {}'.format(
+            'range', 'runs', 'p50 ms', 'p99 ms', 'samples', 'output'))
+        passed = True
+        for name, span in (('hour', 3600), ('day', CHUNK_SPAN),
+                           ('week', 7 * CHUNK_SPAN),
+                           ('all', count * SAMPLE_STEP)):
+            span = min(span, count * SAMPLE_STEP)
+            for downsample in (False, True):
+                durations = []
+                for _ in range(runs):
+                    started = time.time()
+                    if downsample:
+                        result = store.downsample(
+                            config['id'], stop - span, stop, 3600,
+                            fields=fields[:1])[fields[0]]
+                    else:
+                        result = store.query(config['id'], stop - span,
+                                             stop)[0]
+                    durations.append(time.time() - started)
+                expected = span // (3600 if downsample else SAMPLE_STEP)
+                same = len(result) == expected
+                passed = passed and same
+                print('{:<12} {:>6} {:>10.2f} {:>10.2f} {:>10}  {}'.format(
+                    name + (' hourly' if downsample else ''), runs,
+                    get_percentile(durations, 50) * 1000,
+                    get_percentile(durations, 99) * 1000, len(result),
+                    'ok' if same else 'DIFF'))
+    finally:
+        shutil.rmtree(directory, True)
+    return passed
+
+
+def fetch_stations(fetch_pages, station_urls):
+    # the pages of every station, fetched by a thread per station as the
+    # collector does
+    bodies = [None] * len(station_urls)
+
+    def fetch(index, urls):
+        bodies[index] = fetch_pages(urls)
+
+    threads = [threading.Thread(target=fetch, args=(index, urls))
+               for index, urls in enumerate(station_urls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return bodies
+
+
+def backends(pages, runs):
+    # `pages` pages of every station, each station on a local stub of its
+    # own, fetched by the threads and the loop backend; the peak number of
+    # threads is sampled while they run, with the stubs' handler threads
+    # (up to the per-host limit of each stub, for both backends)
+    sys.path.insert(0, ROOT_PATH)
+    from tests.stub import Page
+    from tests.stub import StubServer
+    from core import fetch
+
+    body = b'x' * PAGE_SIZE
+    paths = ['/page{}'.format(index) for index in range(pages)]
+    servers = [StubServer(dict((path, Page(body, delay=PAGE_DELAY))
+                               for path in paths)).start()
+               for _ in STATION_NAMES]
+    station_urls = [[server.url + path for path in paths]
+                    for server in servers]
+    print('{:<8} {:>6} {:>10} {:>10} {:>10} {:>10}  {}'.format(
+        'backend', 'runs', 'pages', 'p50 ms', 'p99 ms', 'threads', 'output'))
+    passed = True
+    try:
+        for backend in ('threads', 'loop'):
+            fetch.FETCH_BACKEND = backend
+            # the loop thread, started once per process, is not counted
+            fetch_stations(fetch.fetch_pages, station_urls)
+            peak = [threading.active_count()]
+            running = threading.Event()
+            running.set()
+
+            def sample():
+                while running.is_set():
+                    peak[0] = max(peak[0], threading.active_count())
+                    time.sleep(0.001)
+
+            sampler = threading.Thread(target=sample)
+            sampler.start()
+            durations = []
+            same = True
+            try:
+                for _ in range(runs):
+                    started = time.time()
+                    bodies = fetch_stations(fetch.fetch_pages, station_urls)
+                    durations.append(time.time() - started)
+                    same = same and bodies == [[body] * pages] * len(servers)
+            finally:
+                running.clear()
+                sampler.join()
+            passed = passed and same
+            print('{:<8} {:>6} {:>10} {:>10.1f} {:>10.1f} {:>10}  {}'.format(
+                backend, runs, '{}x{}'.format(len(servers), pages),
+                get_percentile(durations, 50) * 1000,
+                get_percentile(durations, 99) * 1000, peak[0],
+                'ok' if same else 'DIFF'))
+    finally:
+        for server in servers:
+            server.stop()
+    return passed
+
+
+def get_free_port():
+    sock = socket.socket()
+    try:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
+
+
+def get_peak_rss_of(pid):
+    # KiB, from /proc on Linux
+    path = '/proc/{}/status'.format(pid)
+    try:
+        with io.open(path, encoding='ascii') as status_file:
+            for line in status_file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except IOError:
+        return None
+
+
+def request_metrics(port, runs, latencies, errors):
+    # `runs` requests over one keep-alive connection, as Prometheus makes
+    connection = httplib.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        for _ in range(runs):
+            started = time.time()
+            try:
+                connection.request('GET', '/metrics')
+                response = connection.getresponse()
+                body = response.read()
+                if response.status != 200 or not body.endswith(b'# EOF\n'):
+                    raise IOError('Invalid response')
+            except (IOError, httplib.HTTPException):
+                errors.append(1)
+                connection.close()
+                continue
+            latencies.append(time.time() - started)
+    finally:
+        connection.close()
+
+
+def exporter(clients, runs, directory):
+    # the exporter, in a process of its own, serves the recorded output of
+    # every station as its result to `clients` clients at once
+    from core import results
+
+    results_dir = tempfile.mkdtemp(prefix='uanpps-results-')
+    results.RESULTS_DIR = results_dir
+    for name in STATION_NAMES:
+        with io.open(get_golden_path(directory, name),
+                     encoding='utf-8') as golden_file:
+            results.write_result(name, golden_file.read())
+
+    port = get_free_port()
+    env = dict(os.environ, uanpps_results_dir=results_dir)
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(PLUGINS_PATH, 'uanpps_exporter.py'),
+         '-a', '127.0.0.1', '-p', str(port)], env=env)
+    try:
+        for _ in range(100):
+            try:
+                connection = httplib.HTTPConnection('127.0.0.1', port)
+                connection.request('GET', '/metrics')
+                body = connection.getresponse().read().decode('utf-8')
+                connection.close()
+                break
+            except socket.error:
+                time.sleep(0.05)
+        else:
+            raise IOError('The exporter did not start')
+        same = all('station="{}"'.format(name) in body
+                   for name in STATION_NAMES)
+
+        latencies = []
+        errors = []
+        threads = [threading.Thread(target=request_metrics,
+                                    args=(port, runs, latencies, errors))
+                   for _ in range(clients)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - started
+        peak = get_peak_rss_of(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(results_dir, True)
+
+    print('{:<8} {:>6} {:>10} {:>10} {:>10} {:>8} {:>10}  {}'.format(
+        'clients', 'runs', 'req/s', 'p50 ms', 'p99 ms', 'errors',
+        'peak KiB', 'output'))
+    print('{:<8} {:>6} {:>10.0f} {:>10.2f} {:>10.2f} {:>8} {:>10}  {}'.format(
+        clients, runs, len(latencies) / elapsed,
+        get_percentile(latencies, 50) * 1000 if latencies else 0,
+        get_percentile(latencies, 99) * 1000 if latencies else 0,
+        len(errors), 'n/a' if peak is None else peak,
+        'ok' if same else 'DIFF'))
+    return same and not errors
+
+
+def print_lines(config, colors, data, out):
+    # the output as the plugins printed it before MuninWriter: one write
+    # per line
+    from core.utils import get_color_value
+
+    print('multigraph {}'.format(config['id']), file=out)
+    print('graph_title {}'.format(config['title']), file=out)
+    print('graph_category {}'.format(config['category']), file=out)
+    print('graph_vlabel {}'.format(config['vlabel']), file=out)
+    if config['total']:
+        print('graph_total {}'.format(config['total']), file=out)
+    print('graph_scale {}'.format(config['scale']), file=out)
+    for field in config['fields']:
+        print('{}.label {}'.format(field['id'], field['label']), file=out)
+        if 'colour' in field.keys():
+            print('{}.colour {}'.format(
+                field['id'], get_color_value(colors, field['colour'])),
+                file=out)
+        if 'info' in field.keys():
+            print('{}.info {}'.format(field['id'], field['info']), file=out)
+    print('multigraph {}'.format(config['id']), file=out)
+    for index, field in enumerate(config['fields']):
+        print('{}.value {:.2f}'.format(field['id'], float(data[index])),
+              file=out)
+
+
+def write_buffered(config, colors, data, out):
+    from core.munin import MuninWriter
+    from core.utils import get_values_multigraph
+    from core.utils import init_base_parameters
+    from core.utils import init_multigraph
+
+    writer = MuninWriter(out.encoding)
+    init_multigraph(config, writer)
+    init_base_parameters(config, colors, writer)
+    get_values_multigraph(data, config, out=writer)
+    out.write(writer.getvalue())
+
+
+def output(runs):
+    # both ways write to a line-buffered stream, as print() writes to a
+    # terminal; the outputs must be identical
+    from core.utils import load_json
+
+    colors = load_json(os.path.join(DATA_PATH, 'colors.json'))
+    print('{:<28} {:>6} {:>10} {:>10} {:>10}  {}'.format(
+        'graph', 'runs', 'lines us', 'writer us', 'writes', 'output'))
+    passed = True
+    for graph in OUTPUT_GRAPHS:
+        config = load_json(os.path.join(DATA_PATH, graph))
+        data = [index + 0.25 for index in range(len(config['fields']))]
+        results = []
+        for write in (print_lines, write_buffered):
+            durations = []
+            for _ in range(runs):
+                with io.open(os.devnull, 'w', encoding='utf-8',
+                             buffering=1) as out:
+                    started = time.time()
+                    write(config, colors, data, out)
+                    durations.append(time.time() - started)
+            text = io.StringIO()
+            write(config, colors, data, text)
+            results.append((get_percentile(durations, 50) * 1e6,
+                            text.getvalue()))
+        (lines_time, lines_text), (writer_time, writer_text) = results
+        same = lines_text == writer_text
+        passed = passed and same
+        print('{:<28} {:>6} {:>10.1f} {:>10.1f} {:>10}  {}'.format(
+            graph, runs, lines_time, writer_time,
+            '{} -> 1'.format(len(lines_text.splitlines())),
+            'ok' if same else 'DIFF'))
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Record station pages and benchmark their replay')
+    parser.add_argument('command',
+                        choices=('record', 'run', 'map', 'parse', 'output',
+                                 'tsdb', 'backends', 'exporter'))
+    parser.add_argument('stations', nargs='*',
+                        help='default: {}'.format(' '.join(STATION_NAMES)))
+    parser.add_argument('-n', '--runs', type=int, default=50)
+    parser.add_argument('-d', '--directory', default=FIXTURES_DIR)
+    parser.add_argument('--days', type=int, default=365,
+                        help='days of samples for tsdb (default: 365)')
+    parser.add_argument('--pages', type=int, default=25,
+                        help='pages per station for backends (default: 25)')
+    parser.add_argument('--clients', type=int, default=16,
+                        help='clients of exporter (default: 16)')
+    args = parser.parse_args()
+    names = args.stations or STATION_NAMES
+    for name in names:
+        if name not in STATION_NAMES:
+            parser.error('unknown station: {}'.format(name))
+
+    if args.command == 'output':
+        sys.exit(0 if output(args.runs) else 1)
+    if args.command == 'tsdb':
+        sys.exit(0 if tsdb(args.days, args.runs) else 1)
+    if args.command == 'exporter':
+        sys.exit(0 if exporter(args.clients, args.runs, args.directory)
+                 else 1)
+
+    # read by the fetch code when it is imported: every page comes from the
+    # network (record) or the fixtures (run), never from the response cache;
+    # pages are parsed on every run unless uanpps_memo is set
+    os.environ['uanpps_cache'] = 'False'
+    os.environ.setdefault('uanpps_memo', 'False')
+    if args.command == 'record':
+        ensure_dir(args.directory)
+        os.environ['uanpps_record_dir'] = args.directory
+    else:
+        if args.command != 'backends':
+            os.environ['uanpps_replay_dir'] = args.directory
+        # failures of the live sites must not keep their replayed pages
+        # from being requested
+        hosts_dir = tempfile.mkdtemp(prefix='uanpps-hosts-')
+        atexit.register(shutil.rmtree, hosts_dir, True)
+        os.environ['uanpps_hosts_dir'] = hosts_dir
+
+    if args.command == 'backends':
+        sys.exit(0 if backends(args.pages, args.runs) else 1)
+
+    from core.utils import get_random_user_agent
+
+    stations = [(name, __import__('{}_node'.format(name)))
+                for name in names]
+    if args.command == 'record':
+        passed = record(stations, get_random_user_agent(), args.directory)
+    elif args.command == 'run':
+        passed = run(stations, get_random_user_agent(), args.directory,
+                     args.runs)
+    elif args.command == 'parse':
+        passed = parse(stations, get_random_user_agent(), args.directory,
+                       args.runs)
+    else:
+        passed = map_values(stations, get_random_user_agent(),
+                            args.directory, args.runs)
+    sys.exit(0 if passed else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, print_function
+
+import ast
+import logging
+import os
+import sys
+
+from multiprocessing.pool import ThreadPool
+
+import khnpp_node
+import rnpp_node
+import sunpp_node
+import znpp_node
+
+from core import setup_logging
+from core.results import write_result
+from core.samples import append_samples
+from core.utils import enable_requests_logging
+from core.utils import get_random_user_agent
+
+logger = logging.getLogger('uanpps-collector')
+
+# station settings are read from the environment with the station prefix,
+# e.g. `khnpp_radio_url` or `rnpp_host`
+STATIONS = (
+    ('khnpp', khnpp_node.khnpp_node, khnpp_node.get_config),
+    ('znpp', znpp_node.znpp_node, znpp_node.get_config),
+    ('rnpp', rnpp_node.rnpp_node, rnpp_node.get_config),
+    ('sunpp', sunpp_node.sunpp_node, sunpp_node.get_config),
+)
+
+
+def collect_station(name, node, config, max_age=None):
+    try:
+        values = node(config)
+    except Exception:
+        logger.exception('Failed to collect %s', name)
+        return None
+    if not values:
+        # keep the previous result, it goes stale on its own
+        logger.error('No values collected for %s', name)
+        return None
+    write_result(name, values, max_age)
+    # every reading is kept in the time-series store
+    append_samples(values)
+    return values
+
+
+def collect(stations, user_agent):
+    pool = ThreadPool(len(stations))
+    try:
+        results = [
+            pool.apply_async(collect_station,
+                             (name, node, get_config(user_agent, name + '_')))
+            for name, node, get_config in stations
+        ]
+        return [result.get() for result in results]
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main():
+    setup_logging()
+    logger.info('Start uanpps-collector (main)')
+
+    # turn on requests logging
+    if ast.literal_eval(os.environ.get('uanpps_logging', 'False')):
+        enable_requests_logging()
+
+    results = collect(STATIONS, get_random_user_agent())
+
+    logger.info('Finish uanpps-collector (main)')
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, print_function
+
+import ast
+import logging
+import os
+import signal
+import sys
+import threading
+
+from core import setup_logging
+from core.utils import enable_requests_logging
+from core.utils import get_env
+from core.utils import get_random_user_agent
+
+from uanpps_collector import STATIONS
+from uanpps_collector import collect_station
+
+logger = logging.getLogger('uanpps-daemon')
+
+INTERVAL = int(os.environ.get('uanpps_interval', 300))
+# high-resolution mode: sample more often than munin polls, every sample is
+# kept in the time-series store
+SAMPLE_INTERVAL = int(os.environ.get('uanpps_sample_interval', 0))
+
+
+def run_station(name, node, get_config, stop_event):
+    # station settings use the station prefix, as in the collector
+    interval = int(get_env('interval', INTERVAL, name + '_'))
+    sample_interval = int(get_env('sample_interval', SAMPLE_INTERVAL,
+                                  name + '_'))
+    if sample_interval:
+        interval = sample_interval
+    # values older than two missed scrapes are reported as unknown
+    max_age = 2 * interval
+    logger.info('Scrape %s every %d s', name, interval)
+
+    while not stop_event.is_set():
+        config = get_config(get_random_user_agent(), name + '_')
+        collect_station(name, node, config, max_age)
+        stop_event.wait(interval)
+
+
+def main():
+    setup_logging()
+    logger.info('Start uanpps-daemon (main)')
+
+    # turn on requests logging
+    if ast.literal_eval(os.environ.get('uanpps_logging', 'False')):
+        enable_requests_logging()
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+
+    threads = []
+    for name, node, get_config in STATIONS:
+        thread = threading.Thread(target=run_station,
+                                  args=(name, node, get_config, stop_event),
+                                  name=name)
+        thread.start()
+        threads.append(thread)
+
+    # Event.wait() without a timeout can not be interrupted by signals
+    while not stop_event.is_set():
+        stop_event.wait(1)
+
+    # let running scrapes finish and publish their snapshots
+    for thread in threads:
+        thread.join()
+
+    logger.info('Finish uanpps-daemon (main)')
+    sys.exit(0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals, print_function
+
+import argparse
+import glob
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from BaseHTTPServer import BaseHTTPRequestHandler
+from BaseHTTPServer import HTTPServer
+from SocketServer import ThreadingMixIn
+
+from core import setup_logging
+from core.results import RESULTS_MAX_AGE
+from core.results import get_result_path
+from core.results import load_result
+from core.samples import parse_values
+from core.utils import load_json
+
+logger = logging.getLogger('uanpps-exporter')
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+STATION_NAMES = ('khnpp', 'znpp', 'rnpp', 'sunpp')
+ADDRESS = os.environ.get('uanpps_exporter_address', '')
+PORT = int(os.environ.get('uanpps_exporter_port', 9478))
+# how often the results are checked for changes, in seconds
+CHECK_INTERVAL = float(os.environ.get('uanpps_exporter_check', 1))
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# The exporter never scrapes: it serves the latest results of the collector,
+# the daemon (`--scrape` runs its station threads in this process) or the
+# plugins, rendered once per change of a result, as OpenMetrics gauges named
+# after the munin graphs: uanpps_<graph>{station, field, label[, info]}.
+
+
+def escape(value):
+    # label values and HELP texts
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def load_graph_configs(name):
+    configs = {}
+    for path in sorted(glob.glob(os.path.join(DATA_PATH, name, '*.json'))):
+        config = load_json(path)
+        if isinstance(config, dict) and 'fields' in config:
+            configs[config['id']] = config
+    return configs
+
+
+def get_metric_name(station, graph_id):
+    # graph ids of some stations lack the station prefix
+    if not graph_id.startswith(station + '_'):
+        graph_id = '{}_{}'.format(station, graph_id)
+    return 'uanpps_{}'.format(graph_id)
+
+
+def render_station(station, configs, values):
+    lines = []
+    for graph_id, fields in parse_values(values.decode('utf-8')).items():
+        config = configs.get(graph_id)
+        if config is None:
+            continue
+        metric = get_metric_name(station, graph_id)
+        lines.append('# TYPE {} gauge\n'.format(metric))
+        lines.append('# HELP {} {}\n'.format(metric,
+                                             escape(config['title'])))
+        for field in config['fields']:
+            if field['id'] not in fields:
+                continue
+            labels = [('station', station), ('field', field['id']),
+                      ('label', field['label'])]
+            if field.get('info'):
+                labels.append(('info', field['info']))
+            lines.append('{}{{{}}} {!r}\n'.format(
+                metric, ','.join('{}="{}"'.format(key, escape(value))
+                                 for key, value in labels),
+                fields[field['id']]))
+    return ''.join(lines)
+
+
+def render_updated(updated):
+    metric = 'uanpps_result_updated_seconds'
+    lines = ['# TYPE {} gauge\n'.format(metric),
+             '# HELP {} When the station was scraped\n'.format(metric)]
+    for station, timestamp in updated:
+        lines.append('{}{{station="{}"}} {!r}\n'.format(metric, station,
+                                                        timestamp))
+    return ''.join(lines)
+
+
+class MetricsPage(object):
+    # The rendered page, shared by all requests. Results are checked at most
+    # every `check_interval` seconds and the page is only rendered again
+    # when one of them changed or went stale; values older than their
+    # max_age are left out, as munin shows them as unknown.
+
+    def __init__(self, stations=STATION_NAMES, check_interval=CHECK_INTERVAL,
+                 max_age=RESULTS_MAX_AGE):
+        self.stations = [(name, load_graph_configs(name))
+                         for name in stations]
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.state = None
+        self.expires = None
+        self.checked = 0
+        self.body = b'# EOF\n'
+        self.lock = threading.Lock()
+
+    def get_sources(self):
+        # the newest result of every station: written by the collector or
+        # the daemon, or shared by the plugin runs
+        sources = []
+        for name, _ in self.stations:
+            source = None
+            for result_name in (name, '{}.memo'.format(name)):
+                try:
+                    mtime = os.stat(get_result_path(result_name)).st_mtime
+                except OSError:
+                    continue
+                if source is None or mtime > source[1]:
+                    source = (result_name, mtime)
+            sources.append(source)
+        return sources
+
+    def render(self, sources, now):
+        parts = []
+        updated = []
+        expires = None
+        for (name, configs), source in zip(self.stations, sources):
+            if source is None:
+                continue
+            meta, values = load_result(source[0])
+            if meta is None:
+                continue
+            max_age = meta.get('max_age') or self.max_age
+            if now - meta['updated'] > max_age:
+                continue
+            # the page changes when the result goes stale
+            expiry = meta['updated'] + max_age
+            expires = expiry if expires is None else min(expires, expiry)
+            parts.append(render_station(name, configs, values))
+            updated.append((name, meta['updated']))
+        if updated:
+            parts.append(render_updated(updated))
+        parts.append('# EOF\n')
+        self.body = ''.join(parts).encode('utf-8')
+        self.expires = expires
+        logger.info('Rendered %d bytes for %d stations', len(self.body),
+                    len(updated))
+
+    def get_body(self):
+        now = time.time()
+        if now - self.checked < self.check_interval:
+            return self.body
+        with self.lock:
+            if now - self.checked >= self.check_interval:
+                sources = self.get_sources()
+                if sources != self.state or (
+                        self.expires is not None and now > self.expires):
+                    self.render(sources, now)
+                    self.state = sources
+                self.checked = now
+        return self.body
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # the response is written at once, without waiting for the client's
+    # delayed ACKs on keep-alive connections
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.page.get_body()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # requests are not logged, every scrape would add a line to the log
+        pass
+
+
+class MetricsServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address, page):
+        HTTPServer.__init__(self, address, MetricsHandler)
+        self.page = page
+
+
+def start_scraping(stop_event):
+    # the daemon's station threads, publishing the results served here
+    from uanpps_collector import STATIONS
+    from uanpps_daemon import run_station
+
+    threads = []
+    for name, node, get_config in STATIONS:
+        thread = threading.Thread(target=run_station,
+                                  args=(name, node, get_config, stop_event),
+                                  name=name)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve the station results as OpenMetrics')
+    parser.add_argument('-a', '--address', default=ADDRESS)
+    parser.add_argument('-p', '--port', type=int, default=PORT)
+    parser.add_argument('--scrape', action='store_true',
+                        help='also run the daemon in this process')
+    args = parser.parse_args()
+
+    setup_logging()
+    logger.info('Start uanpps-exporter (main)')
+    stop_event = threading.Event()
+    threads = start_scraping(stop_event) if args.scrape else []
+
+    server = MetricsServer((args.address, args.port), MetricsPage())
+
+    def stop(signum, frame):
+        stop_event.set()
+        # shutdown() waits for serve_forever(), which runs in this thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    server.serve_forever()
+    server.server_close()
+
+    # let running scrapes finish and publish their results
+    for thread in threads:
+        thread.join()
+
+    logger.info('Finish uanpps-exporter (main)')
+    sys.exit(0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+TESTS_PATH = os.path.dirname(os.path.abspath(__file__))
+PLUGINS_PATH = os.path.join(os.path.dirname(TESTS_PATH), 'plugins')
+FIXTURES_PATH = os.path.join(TESTS_PATH, 'fixtures')
+
+sys.path.insert(0, PLUGINS_PATH)
+
+# Settings are read when the core modules are imported: the tests, and the
+# plugins they start, keep their state and logs in a temporary directory and
+# never use the response cache or the extracted values of earlier runs.
+STATE_PATH = tempfile.mkdtemp(prefix='uanpps-tests-')
+atexit.register(shutil.rmtree, STATE_PATH, True)
+
+for name in ('cache_dir', 'config_cache_dir', 'hosts_dir', 'logs_dir',
+             'memo_dir', 'results_dir', 'tsdb_dir'):
+    os.environ['uanpps_' + name] = os.path.join(STATE_PATH, name)
+os.environ['uanpps_user_agents_cache'] = os.path.join(STATE_PATH,
+                                                     'user_agents.txt')
+os.environ['uanpps_cache'] = 'False'
+os.environ['uanpps_memo'] = 'False'
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import ssl
+import threading
+import time
+
+from BaseHTTPServer import BaseHTTPRequestHandler
+from BaseHTTPServer import HTTPServer
+from SocketServer import ThreadingMixIn
+from collections import Counter
+
+# a self-signed certificate of localhost and its key, for TLS stubs
+CERT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'stub.pem')
+
+
+class Page(object):
+    # What the stub answers for a path: the body, or `status` with an empty
+    # body (and the `location` of a redirect), after `delay` seconds; a
+    # matching If-None-Match or If-Modified-Since is answered with 304
+
+    def __init__(self, body=b'', status=200, delay=0, etag=None,
+                 last_modified=None, content_type='text/html; charset=utf-8',
+                 location=None):
+        self.body = body
+        self.status = status
+        self.location = location
+        self.delay = delay
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_type = content_type
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.0: every connection is closed after its response, so no
+    # handler thread outlives the server. A keep-alive stub speaks HTTP/1.1
+    # and closes idle connections after `timeout` seconds.
+    timeout = 1
+
+    def setup(self):
+        self.protocol_version = self.server.protocol_version
+        BaseHTTPRequestHandler.setup(self)
+
+    def handle(self):
+        try:
+            BaseHTTPRequestHandler.handle(self)
+        except ssl.SSLError:
+            # a client closing its TLS connection without a close_notify
+            pass
+
+    def do_GET(self):
+        page = self.server.pages.get(self.path)
+        self.server.enter(self.path, self.headers)
+        try:
+            if page is not None and page.delay:
+                time.sleep(page.delay)
+            self.respond(page)
+        finally:
+            self.server.leave()
+
+    def respond(self, page):
+        if page is None:
+            page = Page(status=404)
+        if page.status != 200:
+            self.send_response(page.status)
+            if page.location:
+                self.send_header('Location', page.location)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if (page.etag and
+                self.headers.get('If-None-Match') == page.etag) or (
+                page.last_modified and
+                self.headers.get('If-Modified-Since') == page.last_modified):
+            self.server.count('not_modified')
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', page.content_type)
+        self.send_header('Content-Length', str(len(page.body)))
+        if page.etag:
+            self.send_header('ETag', page.etag)
+        if page.last_modified:
+            self.send_header('Last-Modified', page.last_modified)
+        self.end_headers()
+        self.wfile.write(page.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    # Local stand-in for the station sites, on a free port: serves `pages`
+    # (path -> Page), counts the requests of every path and the most
+    # requests it served at the same time, and keeps the headers of the
+    # last request. A TLS stub counts the handshakes of its connections.
+    daemon_threads = True
+
+    def __init__(self, pages=None, tls=False, keep_alive=False):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StubHandler)
+        if tls:
+            self.socket = ssl.wrap_socket(self.socket, certfile=CERT_PATH,
+                                          server_side=True)
+        self.scheme = 'https' if tls else 'http'
+        self.protocol_version = 'HTTP/1.1' if keep_alive else 'HTTP/1.0'
+        self.handshakes = 0
+        self.pages = dict(pages or {})
+        self.hits = Counter()
+        self.active = 0
+        self.max_active = 0
+        self.last_headers = None
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        # Python 2 matches the certificate by host name only
+        host = 'localhost' if self.scheme == 'https' else '127.0.0.1'
+        return '{}://{}:{}'.format(self.scheme, host, self.server_address[1])
+
+    def get_request(self):
+        # the TLS handshake is made on accept
+        request = HTTPServer.get_request(self)
+        with self.lock:
+            self.handshakes += self.scheme == 'https'
+        return request
+
+    def count(self, key):
+        with self.lock:
+            self.hits[key] += 1
+
+    def enter(self, path, headers):
+        with self.lock:
+            self.hits[path] += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.last_headers = headers
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
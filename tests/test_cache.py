@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from tests.stub import Page
+from tests.stub import StubServer
+
+from core.cache import ResponseCache
+from core.fetch import fetch_page
+
+LAST_MODIFIED = 'Sun, 18 Oct 2026 12:00:00 GMT'
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = StubServer({
+            '/etag': Page(b'etag body', etag='"v1"'),
+            '/modified': Page(b'modified body', last_modified=LAST_MODIFIED),
+        }).start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def fetch(self, path, cache):
+        return fetch_page(self.server.url + path, cache=cache)
+
+    def test_fresh_hit(self):
+        cache = ResponseCache(self.directory, ttl=60)
+        self.assertEqual(self.fetch('/etag', cache), b'etag body')
+        self.assertEqual(self.fetch('/etag', cache), b'etag body')
+        self.assertEqual(self.server.hits['/etag'], 1)
+
+    def test_revalidation(self):
+        # expired at once: every fetch asks the server, which answers 304
+        cache = ResponseCache(self.directory, ttl=0)
+        for path, header, value in (
+                ('/etag', 'If-None-Match', '"v1"'),
+                ('/modified', 'If-Modified-Since', LAST_MODIFIED)):
+            body = self.fetch(path, cache)
+            self.assertIsNone(self.server.last_headers.get(header))
+            self.assertEqual(self.fetch(path, cache), body)
+            self.assertEqual(self.server.last_headers.get(header), value)
+            self.assertEqual(self.server.hits[path], 2)
+        self.assertEqual(self.server.hits['not_modified'], 2)
+
+    def test_changed_page(self):
+        cache = ResponseCache(self.directory, ttl=0)
+        self.fetch('/etag', cache)
+        self.server.pages['/etag'] = Page(b'new body', etag='"v2"')
+        self.assertEqual(self.fetch('/etag', cache), b'new body')
+        self.assertEqual(self.server.hits['not_modified'], 0)
+
+    def test_unwritable_cache(self):
+        # a path below a file can not be created, even by root
+        path = os.path.join(self.directory, 'file')
+        io.open(path, 'wb').close()
+        cache = ResponseCache(os.path.join(path, 'responses'), ttl=0)
+        self.assertEqual(self.fetch('/etag', cache), b'etag body')
+        self.assertEqual(self.fetch('/etag', cache), b'etag body')
+        self.assertEqual(self.server.hits['/etag'], 2)
+
+    def test_eviction(self):
+        # room for about three entries; the least recently stored go first
+        size = 1000
+        cache = ResponseCache(self.directory, ttl=60, max_size=3 * size + 500)
+        urls = []
+        for index in range(5):
+            path = '/page{}'.format(index)
+            self.server.pages[path] = Page(b'x' * size)
+            urls.append(self.server.url + path)
+            self.fetch(path, cache)
+            # distinct store times, older for the earlier pages
+            os.utime(cache.get_path(urls[-1]), (index, index))
+
+        stored = [url for url in urls if cache.load(url) is not None]
+        self.assertEqual(stored, urls[-3:])
+        total_size = sum(os.path.getsize(os.path.join(self.directory, name))
+                         for name in os.listdir(self.directory))
+        self.assertLessEqual(total_size, cache.max_size)
+
+        # an evicted page is fetched again
+        self.fetch('/page0', cache)
+        self.assertEqual(self.server.hits['/page0'], 2)
+        self.fetch('/page4', cache)
+        self.assertEqual(self.server.hits['/page4'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from core import config_cache
+
+
+class ConfigCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config_cache_dir = config_cache.CONFIG_CACHE_DIR
+        config_cache.CONFIG_CACHE_DIR = os.path.join(self.directory, 'config')
+        self.source = os.path.join(self.directory, 'station.json')
+        with io.open(self.source, 'w', encoding='utf-8') as source_file:
+            source_file.write('{}')
+        self.renders = 0
+
+    def tearDown(self):
+        config_cache.CONFIG_CACHE_DIR = self.config_cache_dir
+        shutil.rmtree(self.directory)
+
+    def render(self, writer):
+        self.renders += 1
+        writer.write('graph_title Station\n')
+
+    def print_config(self):
+        stdout = sys.stdout
+        sys.stdout = io.BytesIO()
+        try:
+            config_cache.print_config('station', [self.source], self.render)
+            return sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    def test_cached_config(self):
+        self.assertEqual(self.print_config(), b'graph_title Station\n')
+        self.assertEqual(self.print_config(), b'graph_title Station\n')
+        self.assertEqual(self.renders, 1)
+
+    def test_unwritable_cache(self):
+        # a path below a file can not be created, even by root
+        path = os.path.join(self.directory, 'file')
+        io.open(path, 'wb').close()
+        config_cache.CONFIG_CACHE_DIR = os.path.join(path, 'config')
+        self.assertEqual(self.print_config(), b'graph_title Station\n')
+        self.assertEqual(self.print_config(), b'graph_title Station\n')
+        self.assertEqual(self.renders, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
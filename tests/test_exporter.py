@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from tests import FIXTURES_PATH
+
+from core import results
+
+import uanpps_exporter
+
+CONFIGS = {
+    'station_graph': {
+        'id': 'station_graph',
+        'title': 'Dose rate \\ 30 km\nzone',
+        'fields': [
+            {'id': 'a', 'label': 'Point "A"'},
+            {'id': 'b', 'label': 'B', 'info': 'C:\\data\nsecond line'},
+            {'id': 'c', 'label': 'C'},
+        ],
+    },
+}
+
+
+class RenderTest(unittest.TestCase):
+
+    def test_render_station(self):
+        values = (b'multigraph station_graph\na.value 0.12\nb.value 3.00\n'
+                  b'multigraph unknown_graph\nx.value 1.00\n')
+        self.assertEqual(
+            uanpps_exporter.render_station('station', CONFIGS, values),
+            '# TYPE uanpps_station_graph gauge\n'
+            '# HELP uanpps_station_graph Dose rate \\\\ 30 km\\nzone\n'
+            'uanpps_station_graph{station="station",field="a",'
+            'label="Point \\"A\\""} 0.12\n'
+            'uanpps_station_graph{station="station",field="b",label="B",'
+            'info="C:\\\\data\\nsecond line"} 3.0\n')
+
+    def test_metric_name(self):
+        self.assertEqual(uanpps_exporter.get_metric_name('znpp', 'znpp_meteo'),
+                         'uanpps_znpp_meteo')
+        self.assertEqual(uanpps_exporter.get_metric_name('khnpp', 'meteo'),
+                         'uanpps_khnpp_meteo')
+
+
+class MetricsPageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.results_dir = results.RESULTS_DIR
+        results.RESULTS_DIR = self.directory
+        with io.open(os.path.join(FIXTURES_PATH, 'znpp.golden'),
+                     encoding='utf-8') as golden_file:
+            self.values = golden_file.read()
+        self.page = uanpps_exporter.MetricsPage(('znpp',), check_interval=0,
+                                                max_age=60)
+        self.renders = []
+        render = self.page.render
+
+        def count_render(sources, now):
+            self.renders.append(now)
+            render(sources, now)
+
+        self.page.render = count_render
+
+    def tearDown(self):
+        results.RESULTS_DIR = self.results_dir
+        shutil.rmtree(self.directory)
+
+    def write_result(self, updated):
+        # a result of the collector, written at `updated`
+        with io.open(results.get_result_path('znpp'), 'w',
+                     encoding='utf-8') as result_file:
+            result_file.write(json.dumps({'station': 'znpp',
+                                          'updated': updated,
+                                          'max_age': None}) + '\n')
+            result_file.write(self.values)
+        # a new modification time, as a later write has
+        os.utime(results.get_result_path('znpp'), (updated, updated))
+
+    def test_render_on_change(self):
+        now = time.time()
+        self.write_result(now - 10)
+        body = self.page.get_body()
+        self.assertIn(b'station="znpp"', body)
+        self.assertIn('uanpps_result_updated_seconds{{station="znpp"}} {!r}'
+                      .format(now - 10).encode('utf-8'), body)
+        self.assertTrue(body.endswith(b'# EOF\n'))
+        self.assertEqual(self.page.get_body(), body)
+        self.assertEqual(len(self.renders), 1)
+
+        self.write_result(now - 5)
+        self.assertNotEqual(self.page.get_body(), body)
+        self.assertEqual(len(self.renders), 2)
+
+    def test_check_interval(self):
+        # within the interval the result is not even looked at
+        self.page.check_interval = 60
+        self.assertEqual(self.page.get_body(), b'# EOF\n')
+        self.write_result(time.time())
+        self.assertEqual(self.page.get_body(), b'# EOF\n')
+        self.assertEqual(len(self.renders), 1)
+
+    def test_stale_result(self):
+        self.write_result(time.time() - 120)
+        self.assertEqual(self.page.get_body(), b'# EOF\n')
+        # a result that goes stale is dropped without any change of files
+        self.write_result(time.time() - 59.5)
+        self.assertIn(b'station="znpp"', self.page.get_body())
+        time.sleep(0.6)
+        self.assertEqual(self.page.get_body(), b'# EOF\n')
+        self.assertEqual(len(self.renders), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from tests.stub import Page
+from tests.stub import StubServer
+
+from core import fetch
+from core.utils import DEFAULT_USER_AGENT
+from core.utils import UserAgentProvider
+
+DELAY = 0.3
+
+
+class FetchPagesTest(unittest.TestCase):
+    # The pages of a run are requested at once: a run takes about as long
+    # as its slowest page, not as all of them together.
+
+    def setUp(self):
+        self.server = StubServer({
+            '/perf': Page(b'perf', delay=DELAY),
+            '/meteo': Page(b'meteo', delay=DELAY),
+            '/arms': Page(b'arms', delay=DELAY),
+        }).start()
+        self.urls = [self.server.url + path
+                     for path in ('/perf', '/meteo', '/arms')]
+        self.backend = fetch.FETCH_BACKEND
+
+    def tearDown(self):
+        fetch.FETCH_BACKEND = self.backend
+        self.server.stop()
+
+    def assert_concurrent(self, backend):
+        fetch.FETCH_BACKEND = backend
+        started = time.time()
+        bodies = fetch.fetch_pages(self.urls, {'User-Agent': 'test'})
+        elapsed = time.time() - started
+
+        self.assertEqual(bodies, [b'perf', b'meteo', b'arms'])
+        self.assertEqual(self.server.max_active, len(self.urls))
+        # one after another the pages take 0.9 s
+        self.assertLess(elapsed, 2 * DELAY)
+
+    def test_threads(self):
+        self.assert_concurrent('threads')
+
+    def test_loop(self):
+        self.assert_concurrent('loop')
+
+    def test_failed_page(self):
+        del self.server.pages['/meteo']
+        bodies = fetch.fetch_pages(self.urls)
+        self.assertEqual(bodies, [b'perf', None, b'arms'])
+
+
+
+class UserAgentProviderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'user_agents.json')
+        with io.open(self.source, 'w', encoding='utf-8') as source_file:
+            source_file.write('["Agent/1.0", "Agent/2.0", "Agent/1.0"]')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cached_list(self):
+        cache_path = os.path.join(self.directory, 'user_agents.txt')
+        provider = UserAgentProvider([self.source], cache_path)
+        self.assertEqual(provider.load(), ['Agent/1.0', 'Agent/2.0'])
+        self.assertTrue(provider.is_cache_valid([self.source]))
+        os.remove(self.source)
+        self.assertEqual(UserAgentProvider([], cache_path).load(),
+                         ['Agent/1.0', 'Agent/2.0'])
+
+    def test_unwritable_cache(self):
+        # a path below a file can not be created, even by root
+        path = os.path.join(self.directory, 'file')
+        io.open(path, 'wb').close()
+        provider = UserAgentProvider(
+            [self.source], os.path.join(path, 'user_agents.txt'))
+        self.assertEqual(provider.load(), ['Agent/1.0', 'Agent/2.0'])
+
+    def test_missing_source(self):
+        provider = UserAgentProvider(
+            [os.path.join(self.directory, 'missing.json')],
+            os.path.join(self.directory, 'user_agents.txt'))
+        self.assertEqual(provider.load(), [DEFAULT_USER_AGENT])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import subprocess
+import sys
+import unittest
+
+from tests import FIXTURES_PATH
+from tests import PLUGINS_PATH
+
+
+class GoldenOutputTest(unittest.TestCase):
+    # The station pages in tests/fixtures were recorded from a local stub
+    # of the sites, with the output of every station (<station>.golden).
+    # They are replayed through the benchmark, which fails on any output
+    # differing from the recorded one.
+
+    def run_bench(self, command, stations=4):
+        bench = subprocess.Popen(
+            [sys.executable, os.path.join(PLUGINS_PATH, 'uanpps_bench.py'),
+             command, '-n', '2', '-d', FIXTURES_PATH],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = bench.communicate()[0].decode('utf-8')
+        self.assertEqual(bench.returncode, 0, output)
+        # every station, with its fields
+        self.assertEqual(output.count(' ok'), stations, output)
+
+    def test_pipeline(self):
+        self.run_bench('run')
+
+    def test_mapping(self):
+        self.run_bench('map')
+
+    def test_parsers(self):
+        # the same values from the whole tree, the strained tree and the
+        # stream; rnpp has JSON pages only
+        self.run_bench('parse', stations=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
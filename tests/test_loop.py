@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import unittest
+
+from tests.stub import Page
+from tests.stub import StubServer
+
+from core.loop import FetchError
+from core.loop import FetchLoop
+from core.loop import MAX_REDIRECTS
+from core.loop import ResponseParser
+
+HEAD = b'HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n'
+CHUNKED = (HEAD + b'Transfer-Encoding: chunked\r\n\r\n'
+           b'5\r\nfirst\r\n7;name=value\r\n, secon\r\nb\r\nd and last\n\r\n'
+           b'0\r\nTrailer: ignored\r\n\r\n')
+TIMEOUT = (5, 5)
+
+
+def feed(parser, response, size=1):
+    # the response as it may arrive, in pieces of `size` bytes
+    for start in range(0, len(response), size):
+        parser.feed(response[start:start + size])
+    return parser
+
+
+class ResponseParserTest(unittest.TestCase):
+
+    def test_content_length(self):
+        parser = feed(ResponseParser(),
+                      HEAD + b'Content-Length: 4\r\n\r\nbody, not this')
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.status, 200)
+        self.assertEqual(parser.headers['content-type'], 'text/html')
+        self.assertEqual(parser.get_body(), b'body')
+
+    def test_chunked(self):
+        for size in (1, 2, 7, len(CHUNKED)):
+            chunks = []
+            parser = feed(ResponseParser(chunks.append), CHUNKED, size)
+            self.assertTrue(parser.done)
+            self.assertEqual(parser.get_body(),
+                             b'first, second and last\n')
+            self.assertEqual(b''.join(chunks), parser.get_body())
+
+    def test_chunked_cut_short(self):
+        parser = feed(ResponseParser(), CHUNKED[:-30])
+        self.assertFalse(parser.done)
+        self.assertRaises(FetchError, parser.feed, b'')
+
+    def test_invalid_chunk_size(self):
+        self.assertRaises(FetchError, feed, ResponseParser(),
+                          HEAD + b'Transfer-Encoding: chunked\r\n\r\nzz\r\n')
+
+    def test_close_delimited(self):
+        # without a length or chunks the body ends with the connection
+        parser = feed(ResponseParser(), HEAD + b'\r\nbody until close', 5)
+        self.assertFalse(parser.done)
+        parser.feed(b'')
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.get_body(), b'body until close')
+
+    def test_closed_before_headers(self):
+        parser = feed(ResponseParser(), HEAD)
+        self.assertRaises(FetchError, parser.feed, b'')
+
+    def test_consumer_stops(self):
+        # a consumer that has what it needs ends the response early
+        parser = feed(ResponseParser(lambda chunk: chunk == b', secon'),
+                      CHUNKED, len(CHUNKED))
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.get_body(), b'first, secon')
+
+    def test_interim_response(self):
+        parser = feed(ResponseParser(), b'HTTP/1.1 100 Continue\r\n\r\n' +
+                      HEAD + b'Content-Length: 2\r\n\r\nok', 3)
+        self.assertEqual(parser.status, 200)
+        self.assertEqual(parser.get_body(), b'ok')
+
+    def test_not_modified(self):
+        parser = feed(ResponseParser(),
+                      b'HTTP/1.1 304 Not Modified\r\nETag: "v1"\r\n\r\n')
+        self.assertTrue(parser.done)
+        self.assertEqual(parser.get_body(), b'')
+
+
+class FetchLoopTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer({
+            '/page': Page(b'page'),
+            '/relative': Page(status=302, location='/page'),
+            '/moved': Page(status=301, location='/relative'),
+            '/loop': Page(status=307, location='/loop'),
+        }).start()
+        self.loop = FetchLoop(2)
+
+    def tearDown(self):
+        self.loop.stop()
+        self.server.stop()
+
+    def fetch(self, path):
+        return self.loop.submit(self.server.url + path, {},
+                                TIMEOUT).wait()
+
+    def test_redirects(self):
+        status, _, body, url = self.fetch('/moved')
+        self.assertEqual((status, body), (200, b'page'))
+        self.assertEqual(url, self.server.url + '/page')
+        self.assertEqual(self.server.hits['/relative'], 1)
+
+    def test_absolute_redirect(self):
+        self.server.pages['/absolute'] = Page(
+            status=302, location=self.server.url + '/page')
+        self.assertEqual(self.fetch('/absolute')[2], b'page')
+
+    def test_too_many_redirects(self):
+        self.assertRaises(FetchError, self.fetch, '/loop')
+        self.assertEqual(self.server.hits['/loop'], MAX_REDIRECTS + 1)
+
+    def test_missing_page(self):
+        # the status is the caller's to check
+        self.assertEqual(self.fetch('/missing')[0], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
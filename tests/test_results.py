@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import urlparse
+
+from tests import FIXTURES_PATH
+from tests import PLUGINS_PATH
+from tests.stub import Page
+from tests.stub import StubServer
+
+from core import results
+from core.replay import load_fixture
+
+# the pages znpp_node.py fetches, by its settings (munin's plugin
+# environment, without the station prefix)
+PAGES = (
+    ('perform_url',
+     'https://www.npp.zp.ua/uk/activities/performance-indicators'),
+    ('meteo_url', 'https://www.npp.zp.ua/uk/safety/meteo'),
+    ('radio_url', 'https://www.npp.zp.ua/uk/safety/arms'),
+)
+RUNS = 10
+DELAY = 0.5
+
+
+class MemoizedResultTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.results_dir = results.RESULTS_DIR
+        results.RESULTS_DIR = self.directory
+
+    def tearDown(self):
+        results.RESULTS_DIR = self.results_dir
+        shutil.rmtree(self.directory)
+
+    def get_scrape(self, values):
+        scrapes = []
+
+        def scrape():
+            scrapes.append(values)
+            return values
+
+        return scrape, scrapes
+
+    def test_fresh_result(self):
+        scrape, scrapes = self.get_scrape('a.value 1.00\n')
+        self.assertEqual(results.get_memoized_result('st', scrape),
+                         'a.value 1.00\n')
+        self.assertEqual(results.get_memoized_result('st', scrape),
+                         'a.value 1.00\n')
+        self.assertEqual(len(scrapes), 1)
+        # out of the freshness window the station is scraped again
+        results.get_memoized_result('st', scrape, fresh=-1)
+        self.assertEqual(len(scrapes), 2)
+
+    def test_failed_scrape(self):
+        scrape, scrapes = self.get_scrape('')
+        results.get_memoized_result('st', scrape)
+        results.get_memoized_result('st', scrape)
+        self.assertEqual(len(scrapes), 2)
+        self.assertFalse(os.path.exists(results.get_result_path('st.memo')))
+
+    def test_unwritable_results(self):
+        # a path below a file can not be created, even by root
+        path = os.path.join(self.directory, 'file')
+        io.open(path, 'wb').close()
+        results.RESULTS_DIR = os.path.join(path, 'results')
+        scrape, scrapes = self.get_scrape('a.value 1.00\n')
+        self.assertEqual(results.get_memoized_result('st', scrape),
+                         'a.value 1.00\n')
+        self.assertEqual(results.get_memoized_result('st', scrape),
+                         'a.value 1.00\n')
+        self.assertEqual(len(scrapes), 2)
+
+
+class ParallelRunsTest(unittest.TestCase):
+    # Overlapping runs of a plugin, as started by several munin masters,
+    # scrape the station once: a stub serving the recorded ZNPP pages
+    # counts the requests.
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        pages = {}
+        self.env = dict(os.environ)
+        for setting, url in PAGES:
+            _, body = load_fixture(FIXTURES_PATH, url)
+            path = urlparse.urlparse(url).path
+            pages[path] = Page(body, delay=DELAY)
+            self.env[setting] = path
+        self.server = StubServer(pages).start()
+        for setting, _ in PAGES:
+            self.env[setting] = self.server.url + self.env[setting]
+        for name in ('hosts_dir', 'results_dir'):
+            self.env['uanpps_' + name] = os.path.join(self.directory, name)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def test_parallel_runs(self):
+        runs = [subprocess.Popen(
+            [sys.executable, os.path.join(PLUGINS_PATH, 'znpp_node.py')],
+            stdout=subprocess.PIPE, env=self.env) for _ in range(RUNS)]
+        outputs = [run.communicate()[0] for run in runs]
+
+        self.assertEqual([run.returncode for run in runs], [0] * RUNS)
+        self.assertEqual(sum(self.server.hits.values()), len(PAGES))
+        self.assertEqual(len(set(outputs)), 1)
+        with io.open(os.path.join(FIXTURES_PATH, 'znpp.golden'),
+                     'rb') as golden_file:
+            self.assertTrue(outputs[0].startswith(golden_file.read()))
+
+
+if __name__ == '__main__':
+    unittest.main()
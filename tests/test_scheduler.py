@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from requests.exceptions import HTTPError
+
+from tests.stub import Page
+from tests.stub import StubServer
+
+from core import fetch
+from core.scheduler import BACKOFF_BASE
+from core.scheduler import BACKOFF_MAX
+from core.scheduler import CircuitOpenError
+from core.scheduler import FAILURE_THRESHOLD
+from core.scheduler import HostScheduler
+from core.scheduler import HostState
+
+DELAY = 0.2
+
+
+class HostSchedulerTest(unittest.TestCase):
+    # The fetch code runs against a stub that fails or answers late, with
+    # a scheduler of its own
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.scheduler = HostScheduler(self.directory, concurrency=2)
+        self.host_scheduler = fetch.HOST_SCHEDULER
+        fetch.HOST_SCHEDULER = self.scheduler
+        self.server = StubServer({
+            '/fail': Page(status=500),
+            '/slow': Page(b'slow', delay=DELAY),
+        }).start()
+
+    def tearDown(self):
+        self.server.stop()
+        fetch.HOST_SCHEDULER = self.host_scheduler
+        shutil.rmtree(self.directory)
+
+    def fetch(self, path):
+        return fetch.fetch_page(self.server.url + path, cache=None)
+
+    def get_state(self):
+        state, _ = self.scheduler.get_host(self.server.url)
+        return state
+
+    def open_circuit(self):
+        for _ in range(FAILURE_THRESHOLD):
+            self.assertRaises(HTTPError, self.fetch, '/fail')
+
+    def test_circuit_opens(self):
+        self.open_circuit()
+        # the failing host is not requested again until its backoff ends
+        self.assertRaises(CircuitOpenError, self.fetch, '/slow')
+        self.assertRaises(CircuitOpenError, self.fetch, '/fail')
+        self.assertEqual(self.server.hits['/fail'], FAILURE_THRESHOLD)
+        self.assertEqual(self.server.hits['/slow'], 0)
+
+        state = self.get_state()
+        self.assertEqual(state.failures, FAILURE_THRESHOLD)
+        self.assertGreater(state.error_rate, 0.5)
+        self.assertGreaterEqual(state.retry_at - time.time(),
+                                BACKOFF_BASE / 2 - 1)
+
+        # plugins started later share the state
+        shared = HostScheduler(self.directory)
+        self.assertRaises(CircuitOpenError, shared.open_request,
+                          self.server.url + '/slow')
+
+    def test_circuit_closes(self):
+        self.open_circuit()
+        # once the backoff ended, a success closes the circuit
+        self.get_state().retry_at = time.time() - 1
+        self.assertEqual(self.fetch('/slow'), b'slow')
+
+        state = self.get_state()
+        self.assertEqual(state.failures, 0)
+        self.assertFalse(state.is_open(time.time()))
+        self.assertGreaterEqual(state.latency, DELAY)
+        with io.open(self.scheduler.get_path(state.host),
+                     encoding='utf-8') as state_file:
+            self.assertEqual(json.load(state_file)['failures'], 0)
+        self.assertEqual(self.fetch('/slow'), b'slow')
+
+    def test_failure_after_backoff(self):
+        self.open_circuit()
+        state = self.get_state()
+        state.retry_at = time.time() - 1
+        # a failed retry opens the circuit again, for a longer backoff
+        self.assertRaises(HTTPError, self.fetch, '/fail')
+        self.assertEqual(state.failures, FAILURE_THRESHOLD + 1)
+        self.assertTrue(state.is_open(time.time()))
+        self.assertGreaterEqual(state.retry_at - time.time(),
+                                min(BACKOFF_MAX, 2 * BACKOFF_BASE) / 2 - 1)
+
+    def test_unwritable_state(self):
+        # a path below a file can not be created, even by root
+        path = os.path.join(self.directory, 'file')
+        io.open(path, 'wb').close()
+        fetch.HOST_SCHEDULER = HostScheduler(os.path.join(path, 'hosts'))
+        self.assertEqual(self.fetch('/slow'), b'slow')
+        self.open_circuit()
+        self.assertRaises(CircuitOpenError, self.fetch, '/slow')
+
+    def test_host_concurrency(self):
+        bodies = []
+        threads = [threading.Thread(
+            target=lambda: bodies.append(self.fetch('/slow')))
+            for _ in range(6)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(bodies, [b'slow'] * 6)
+        self.assertEqual(self.server.max_active, 2)
+        # three rounds of two requests
+        self.assertGreaterEqual(time.time() - started, 3 * DELAY)
+
+
+class BackoffTest(unittest.TestCase):
+
+    def test_jitter_bounds(self):
+        # equal jitter: between half and all of the exponential delay,
+        # which is capped at BACKOFF_MAX
+        for extra in range(12):
+            state = HostState('host', failures=FAILURE_THRESHOLD + extra)
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** extra)
+            backoffs = [state.get_backoff() for _ in range(200)]
+            self.assertGreaterEqual(min(backoffs), delay / 2)
+            self.assertLessEqual(max(backoffs), delay)
+            # spread over the range, not a fixed delay
+            self.assertGreater(max(backoffs) - min(backoffs), delay / 4)
+
+    def test_closed_below_threshold(self):
+        state = HostState('host')
+        now = time.time()
+        for _ in range(FAILURE_THRESHOLD - 1):
+            state.record_failure(now)
+        self.assertFalse(state.is_open(now))
+        state.record_failure(now)
+        self.assertTrue(state.is_open(now))
+        self.assertFalse(state.is_open(state.retry_at))
+
+
+if __name__ == '__main__':
+    unittest.main()
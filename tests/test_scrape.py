@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import unittest
+
+from tests import PLUGINS_PATH
+
+from core import scrape
+from core.utils import load_json
+
+
+class FingerprintTest(unittest.TestCase):
+    # the memoized values of a page are only reused by the same spec and
+    # extraction code
+
+    def setUp(self):
+        self.spec = load_json(os.path.join(PLUGINS_PATH, 'data', 'znpp',
+                                           scrape.SPEC_FILENAME))['pages'][0]
+        self.body = b'<html><body><p>page</p></body></html>'
+        self.code_hash = scrape.get_code_hash()
+
+    def tearDown(self):
+        scrape._code_hash = self.code_hash
+
+    def get_fingerprint(self, spec):
+        return scrape.compile_page(spec)[3](self.body)
+
+    def test_extraction_code(self):
+        self.assertTrue(all(os.path.isfile(path)
+                            for path in scrape.EXTRACT_FILES))
+        fingerprint = self.get_fingerprint(self.spec)
+        self.assertEqual(self.get_fingerprint(self.spec), fingerprint)
+        scrape._code_hash = 'changed'
+        self.assertNotEqual(self.get_fingerprint(self.spec), fingerprint)
+
+    def test_spec(self):
+        fingerprint = self.get_fingerprint(self.spec)
+        spec = dict(self.spec, encoding='cp1251')
+        self.assertNotEqual(self.get_fingerprint(spec), fingerprint)
+
+
+if __name__ == '__main__':
+    unittest.main()
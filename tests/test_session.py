@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import unittest
+
+import requests
+
+from tests.stub import CERT_PATH
+from tests.stub import Page
+from tests.stub import StubServer
+
+from core import fetch
+
+PATHS = ('/perf', '/meteo', '/arms')
+RUNS = 5
+
+
+class HandshakesTest(unittest.TestCase):
+    # The pages of a station on one TLS host, fetched on every run: before
+    # the shared session each page was a connection and a handshake of its
+    # own, now the connections of the first run are kept alive.
+
+    def setUp(self):
+        self.server = StubServer(
+            dict((path, Page(path.encode('ascii'))) for path in PATHS),
+            tls=True, keep_alive=True).start()
+        self.urls = [self.server.url + path for path in PATHS]
+        # trusted by requests for the stub's certificate
+        self.ca_bundle = os.environ.get('REQUESTS_CA_BUNDLE')
+        os.environ['REQUESTS_CA_BUNDLE'] = CERT_PATH
+
+    def tearDown(self):
+        self.server.stop()
+        if self.ca_bundle is None:
+            del os.environ['REQUESTS_CA_BUNDLE']
+        else:
+            os.environ['REQUESTS_CA_BUNDLE'] = self.ca_bundle
+
+    def get_handshakes(self, fetch_run):
+        # handshakes of every run
+        handshakes = []
+        for _ in range(RUNS):
+            before = self.server.handshakes
+            self.assertEqual(fetch_run(), [path.encode('ascii')
+                                           for path in PATHS])
+            handshakes.append(self.server.handshakes - before)
+        return handshakes
+
+    def test_without_session(self):
+        self.assertEqual(
+            self.get_handshakes(lambda: [requests.get(url).content
+                                         for url in self.urls]),
+            [len(PATHS)] * RUNS)
+
+    def test_shared_session(self):
+        handshakes = self.get_handshakes(
+            lambda: fetch.fetch_pages(self.urls))
+        # the pages of the first run are requested at once
+        self.assertLessEqual(handshakes[0], len(PATHS))
+        self.assertEqual(handshakes[1:], [0] * (RUNS - 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
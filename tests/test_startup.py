@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from tests import PLUGINS_PATH
+
+PLUGIN = os.path.join(PLUGINS_PATH, 'znpp_node.py')
+# time a `config` or `autoconf` run may add to the interpreter's own start;
+# importing requests and bs4, or numpy, takes longer than that alone
+STARTUP_BUDGET = 0.05
+RUNS = 5
+# modules only a scrape needs
+SCRAPE_MODULES = ('bs4', 'requests', 'numpy')
+
+# runs the plugin as munin does and writes the names of the modules it
+# imported to a file
+RUN_PLUGIN = '''
+import atexit
+import json
+import os
+import runpy
+import sys
+
+plugin, path = sys.argv[1:3]
+sys.argv = [plugin] + sys.argv[3:]
+sys.path.insert(0, os.path.dirname(plugin))
+
+
+def dump_modules():
+    with open(path, 'w') as modules_file:
+        json.dump(sorted(name for name, module in sys.modules.items()
+                         if module is not None), modules_file)
+
+atexit.register(dump_modules)
+runpy.run_path(plugin, run_name='__main__')
+'''
+
+
+class StartupTest(unittest.TestCase):
+    # `config` and `autoconf` runs, which munin starts for every plugin on
+    # every update, never load the scraping stack
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_modules(self, command):
+        path = os.path.join(self.directory, 'modules.json')
+        with open(os.devnull, 'wb') as devnull:
+            subprocess.check_call(
+                [sys.executable, '-c', RUN_PLUGIN, PLUGIN, path, command],
+                stdout=devnull)
+        with io.open(path, encoding='utf-8') as modules_file:
+            return set(name.split('.')[0]
+                       for name in json.load(modules_file))
+
+    def get_startup(self, *args):
+        # the fastest of a few runs, the least disturbed by other processes
+        durations = []
+        with open(os.devnull, 'wb') as devnull:
+            for _ in range(RUNS):
+                started = time.time()
+                subprocess.check_call([sys.executable] + list(args),
+                                      stdout=devnull)
+                durations.append(time.time() - started)
+        return min(durations)
+
+    def assert_startup(self, command):
+        self.assertEqual(
+            self.get_modules(command) & set(SCRAPE_MODULES), set())
+        # the config is rendered and cached by the first run
+        startup = self.get_startup(PLUGIN, command)
+        baseline = self.get_startup('-c', 'pass')
+        self.assertLess(startup - baseline, STARTUP_BUDGET)
+
+    def test_config(self):
+        self.assert_startup('config')
+
+    def test_autoconf(self):
+        self.assert_startup('autoconf')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+from core.tsdb import CHUNK_SPAN
+from core.tsdb import TIME_COLUMN
+from core.tsdb import TimeSeriesStore
+
+GRAPH = 'station_graph'
+# the start of a chunk
+START = 1700000000 // CHUNK_SPAN * CHUNK_SPAN
+
+
+def to_list(values):
+    # NaN as None, which compares equal
+    return [None if math.isnan(value) else value for value in values]
+
+
+class TimeSeriesStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = TimeSeriesStore(self.directory,
+                                     retention=2 * CHUNK_SPAN)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def append(self, timestamp, **values):
+        self.store.append(GRAPH, timestamp, values)
+
+    def query(self, start, stop, fields=None):
+        times, columns = self.store.query(GRAPH, start, stop, fields)
+        return to_list(times), dict((field, to_list(values))
+                                    for field, values in columns.items())
+
+    def test_chunk_boundary(self):
+        self.append(START + CHUNK_SPAN - 60, a=1)
+        self.append(START + CHUNK_SPAN, a=2)
+        self.append(START + CHUNK_SPAN + 60, a=3)
+        self.assertEqual([chunk.start for chunk in
+                          self.store.get_chunks(GRAPH)],
+                         [START, START + CHUNK_SPAN])
+        # ranges include their start and exclude their stop
+        self.assertEqual(self.query(START, START + CHUNK_SPAN + 60),
+                         ([START + CHUNK_SPAN - 60, START + CHUNK_SPAN],
+                          {'a': [1, 2]}))
+        self.assertEqual(self.query(START + CHUNK_SPAN, START + CHUNK_SPAN),
+                         ([], {'a': []}))
+        self.assertEqual(
+            self.query(START + CHUNK_SPAN, START + 2 * CHUNK_SPAN),
+            ([START + CHUNK_SPAN, START + CHUNK_SPAN + 60], {'a': [2, 3]}))
+
+    def test_new_field(self):
+        # a field is unknown for the samples before it first appears
+        self.append(START, a=1)
+        self.append(START + 60, a=2, b=20)
+        self.append(START + 120, b=30)
+        self.assertEqual(self.query(START, START + 180)[1],
+                         {'a': [1, 2, None], 'b': [None, 20, 30]})
+
+    def test_interrupted_append(self):
+        self.append(START, a=1, b=10)
+        chunk = self.store.get_chunks(GRAPH)[0]
+        # a run stopped after writing one field: the time column, written
+        # last, does not count the sample
+        chunk.get_column('a').append(2)
+        self.assertEqual(self.query(START, START + 120)[1],
+                         {'a': [1], 'b': [10]})
+        # the next sample lines the columns up again
+        self.append(START + 60, a=3, b=30)
+        self.assertEqual(self.query(START, START + 120)[1],
+                         {'a': [1, 3], 'b': [10, 30]})
+        # a column cut short reads its missing tail as unknown
+        path = chunk.get_column('b').path
+        with open(path, 'r+b') as column_file:
+            column_file.truncate(os.path.getsize(path) // 2)
+        self.assertEqual(self.query(START, START + 120)[1],
+                         {'a': [1, 3], 'b': [10, None]})
+        self.assertEqual(len(chunk.get_column(TIME_COLUMN)), 2)
+
+    def test_retention(self):
+        for day in range(5):
+            self.append(START + day * CHUNK_SPAN, a=day)
+        # every new chunk drops the chunks past the retention
+        self.assertEqual([chunk.start for chunk in
+                          self.store.get_chunks(GRAPH)],
+                         [START + 2 * CHUNK_SPAN, START + 3 * CHUNK_SPAN,
+                          START + 4 * CHUNK_SPAN])
+        self.store.compact(GRAPH, START + 6 * CHUNK_SPAN)
+        self.assertEqual([chunk.start for chunk in
+                          self.store.get_chunks(GRAPH)],
+                         [START + 4 * CHUNK_SPAN])
+
+    def test_downsample(self):
+        for minute in range(120):
+            self.append(START + minute * 60, a=minute,
+                        b=float('nan') if minute < 60 else 1)
+        self.assertEqual(
+            self.store.downsample(GRAPH, START, START + 7200, 3600),
+            {'a': [(START, 29.5), (START + 3600, 89.5)],
+             'b': [(START + 3600, 1)]})
+        self.assertEqual(
+            self.store.downsample(GRAPH, START + 1800, START + 7200, 3600,
+                                  'max', ['a']),
+            {'a': [(START + 1800, 89), (START + 5400, 119)]})
+
+
+if __name__ == '__main__':
+    unittest.main()